@@ -1,3 +1,4 @@
+import random
 import sys
 
 import pygame
@@ -5,6 +6,10 @@ import pygame
 from .entities import create_button
 from .entities import create_mouse_entity
 from .entities import create_square
+from .inputs import InputRecorder
+from .inputs import LiveInput
+from .modules.esper import Profiler
+from .modules.esper import Scheduler
 from .modules.esper import World
 from .processors import CollisionProcessor
 from .processors import EventProcessor
@@ -12,34 +17,121 @@ from .processors import MovementProcessor
 from .processors import ParticleProcessor
 from .processors import PhysicsProcessor
 from .processors import RenderProcessor
+from .storage import ColumnStore
 
 
 class App:
-    def __init__(self):
+    def __init__(self, columnar=False, parallel=False, profile=False,
+                 profile_path=None, batched_particles=False, dirty_rects=False,
+                 timestep=None, max_steps=5, max_frame_skip=5, seed=None,
+                 record_path=None, input_source=None):
         self._running = True
         self.clock = pygame.time.Clock()
         self.world = None
+        self.columnar = columnar
+        self.parallel = parallel
+        self.profile = profile or profile_path is not None
+        self.profile_path = profile_path
+        self.batched_particles = batched_particles
+        self.dirty_rects = dirty_rects
+        self.timestep = timestep
+        self.max_steps = max_steps
+        self.max_frame_skip = max_frame_skip
+        self.accumulator = 0.0
+        self.skipped_frames = 0
+        self.seed = seed
+        self.record_path = record_path
+        self.input = input_source or LiveInput()
+
+    @property
+    def running(self):
+        return self._running
+
+    def get_options(self):
+        """The options that change how the simulation plays out, as recorded in input logs."""
+        return {
+            'columnar': self.columnar,
+            'parallel': self.parallel,
+            'profile': self.profile,
+            'batched_particles': self.batched_particles,
+            'dirty_rects': self.dirty_rects,
+            'timestep': self.timestep,
+            'max_steps': self.max_steps,
+            'max_frame_skip': self.max_frame_skip,
+        }
 
     def on_init(self):
         pygame.init()
-        self.world = World()
+        if self.record_path:
+            if self.seed is None:
+                self.seed = random.getrandbits(32)
+            self.input = InputRecorder(self.record_path, self.seed, self.get_options())
+        if self.seed is not None:
+            random.seed(self.seed)
+        self.world = World(
+            timed=Profiler(export_path=self.profile_path) if self.profile else False)
         self.world.game = self
+        if self.columnar:
+            ColumnStore().register(self.world)
 
         self.create_processors()
+        self.world.get_processor(RenderProcessor).show_profiler = self.profile
+        if self.parallel:
+            self.world.set_scheduler(Scheduler())
 
         # self.mouse_entity = create_mouse_entity(self.world)
 
         self._running = True
 
     def create_processors(self):
-        self.world.add_processor(EventProcessor(), 5)
-        self.world.add_processor(ParticleProcessor(), 4)
+        self.world.add_processor(EventProcessor(self.input), 5)
+        self.world.add_processor(ParticleProcessor(batched=self.batched_particles), 4)
         self.world.add_processor(PhysicsProcessor(), 3)
-        self.world.add_processor(MovementProcessor(), 2)
-        self.world.add_processor(CollisionProcessor(), 1)
-        self.world.add_processor(RenderProcessor(), 0)
+        # collisions clip this frame's deltas before movement applies them
+        self.world.add_processor(CollisionProcessor(), 2)
+        self.world.add_processor(MovementProcessor(self.input), 1)
+        self.world.add_processor(RenderProcessor(dirty_rects=self.dirty_rects), 0)
+
+    def update(self, dt):
+        """
+        Advance the game by one displayed frame of `dt` seconds.
+
+        Without a timestep every processor runs once with `dt`. With one, the
+        simulation runs in fixed steps from an accumulator, at most
+        `max_steps` per frame. While still behind, up to `max_frame_skip`
+        frames in a row skip rendering to catch up, after which the backlog
+        is dropped. The renderer draws between the last two steps, by the
+        fraction of a step left in the accumulator.
+        """
+        if not self.timestep:
+            self.world.process(dt)
+            return
+
+        renderer = self.world.get_processor(RenderProcessor)
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= self.timestep and steps < self.max_steps:
+            self.world.process_step(self.timestep)
+            if renderer:
+                renderer.record_step()
+            self.accumulator -= self.timestep
+            steps += 1
+
+        if self.accumulator >= self.timestep:
+            if self.skipped_frames < self.max_frame_skip:
+                self.skipped_frames += 1
+                return
+            self.accumulator %= self.timestep
+        self.skipped_frames = 0
+        self.world.process_frame(dt, alpha=self.accumulator / self.timestep)
+
+    def stop(self):
+        """Finish the current frame, then leave the main loop."""
+        self._running = False
 
     def on_cleanup(self):
+        self.input.close()
+        self.world.set_scheduler(None)
         pygame.quit()
         sys.exit()
 
@@ -48,8 +140,8 @@ class App:
             self._running = False
 
         while(self._running):
-            dt = self.clock.tick(60)/1000
+            dt = self.input.tick(self.clock.tick(60)/1000)
 
-            self.world.process(dt)
+            self.update(dt)
 
         self.on_cleanup()
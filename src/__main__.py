@@ -1,3 +1,11 @@
+import argparse
+
 from . import App
 
-App().on_execute()
+parser = argparse.ArgumentParser(prog='python -m src')
+parser.add_argument('--record', metavar='PATH',
+                    help='log input to PATH, for `python -m src.replay`')
+parser.add_argument('--seed', type=int, help='seed the random number generator')
+args = parser.parse_args()
+
+App(seed=args.seed, record_path=args.record).on_execute()
@@ -0,0 +1,250 @@
+"""
+Headless benchmarks of the full frame loop.
+
+Builds the real App, with the processors from `App.create_processors`, on
+SDL's dummy video driver, populates it from a scripted scenario and runs a
+fixed number of 1/60 s frames. Frame and per-processor timings
+are printed (or written) as JSON, e.g.
+
+    python -m src.benchmark emitters colliders --count 50 --columnar
+    python -m src.benchmark text --dirty-rects --output text.json
+    python -m src.benchmark --snapshot 100000
+
+Run it from the repository root, like the game, so assets resolve. pygame
+prints a banner to stdout when the package is imported; set
+PYGAME_HIDE_SUPPORT_PROMPT=1 or use --output when piping the JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from . import App
+from .components import Collider
+from .components import Physics
+from .components import Position
+from .components import Renderable
+from .components import Size
+from .components import Text
+from .entities import create_button
+from .entities import create_particle_emitter
+from .modules.esper import Profiler
+from .modules.esper import World
+from .processors import RenderProcessor
+from .snapshot import Snapshot
+from .snapshot import save_world
+from .storage import ColumnStore
+
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a scenario: a function populating a World, which may return a per-frame step."""
+    def register(function):
+        SCENARIOS[name] = function
+        return function
+    return register
+
+
+@scenario('emitters')
+def emitters(world, count):
+    for _ in range(count):
+        create_particle_emitter(world, (random.randint(0, 800), random.randint(0, 600)))
+
+
+@scenario('colliders')
+def colliders(world, count):
+    for _ in range(count):
+        size = random.randint(4, 16)
+        world.create_entity(
+            Position(random.randint(0, 800), random.randint(0, 600)),
+            Size(size, size),
+            Collider(),
+            Renderable(size=(size, size), color=(200, 200, 200)),
+            Physics(velocity=(random.randint(-100, 100), random.randint(-100, 100))),
+        )
+
+
+@scenario('sprites')
+def sprites(world, count):
+    for _ in range(count):
+        world.create_entity(
+            Position(random.randint(0, 800), random.randint(0, 600)),
+            Size(8, 8),
+            Renderable(size=(8, 8), color=(255, 255, 255)),
+        )
+
+
+@scenario('text')
+def text(world, count):
+    labels = []
+    columns = 10
+    for index in range(count):
+        row, column = divmod(index, columns)
+        create_button(world, (10 + column * 78, 10 + row * 24), (70, 20), f'BUTTON {index}')
+    for ent, label in list(world.get_component(Text)):
+        world.add_component(ent, Renderable(size=(1, 1), color=(0, 0, 0)))
+        labels.append(label)
+
+    def step(frame):
+        # one label changes every frame, the rest stay clean
+        label = labels[frame % len(labels)]
+        label.string = f'FRAME {frame}'
+        label.dirty = True
+    return step if labels else None
+
+
+def run(name, count=10, frames=600, warmup=60, seed=0, **options):
+    """
+    Run one scenario and summarize its timings.
+
+    :param name: The registered scenario to run.
+    :param count: How many things the scenario creates.
+    :param frames: How many frames to time.
+    :param warmup: How many frames to run before timing starts.
+    :param seed: The seed for `random`.
+    :param options: Keyword arguments for `App`, such as `columnar=True`.
+                    Profiling is always on.
+    :return: A dict of the frame and per-processor percentiles.
+    """
+    random.seed(seed)
+    app = App(**dict(options, profile=True))
+    app.on_init()
+    world = app.world
+    world.get_processor(RenderProcessor).show_profiler = False
+    step = SCENARIOS[name](world, count)
+
+    for frame in range(warmup):
+        if step:
+            step(frame)
+        app.update(1/60)
+
+    # fixed-step processors record a sample per step, several per frame
+    profiler = world.profiler = Profiler(window=frames * (app.max_steps + 1))
+    start = time.perf_counter()
+    for frame in range(warmup, warmup + frames):
+        if step:
+            step(frame)
+        app.update(1/60)
+    elapsed = time.perf_counter() - start
+
+    stats = profiler.stats()
+    result = {
+        'scenario': name,
+        'count': count,
+        'frames': frames,
+        'seed': seed,
+        'options': options,
+        'total_s': elapsed,
+        'fps': frames / elapsed,
+        'frame': stats.pop('frame'),
+        'processors': stats,
+    }
+    world.set_scheduler(None)
+    pygame.quit()
+    return result
+
+
+def run_snapshot(count=100000, seed=0, columnar=False, path=None):
+    """
+    Time saving and loading a World of `count` moving sprites.
+
+    :return: A dict of the file size and the save, open, restore and
+             numeric column read times, in seconds.
+    """
+    random.seed(seed)
+    world = World()
+    if columnar:
+        ColumnStore().register(world)
+    world.create_entities(count, lambda index: (
+        Position(random.random() * 800, random.random() * 600),
+        Size(8, 8),
+        Physics(velocity=(random.random() * 200 - 100, random.random() * 200 - 100)),
+        Renderable(size=(8, 8), color=(255, 255, 255)),
+    ))
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'benchmark.snapshot')
+
+    start = time.perf_counter()
+    saved = save_world(world, path)
+    save_s = time.perf_counter() - start
+
+    loaded = World()
+    if columnar:
+        ColumnStore().register(loaded)
+    start = time.perf_counter()
+    with Snapshot(path) as snapshot:
+        open_s = time.perf_counter() - start
+        start = time.perf_counter()
+        # views into the map, so they are read and dropped before it closes
+        positions = snapshot.column(Position)
+        x_total = sum(float(rows['x'].sum()) for _, rows in positions)
+        column_s = time.perf_counter() - start
+        rows = sum(len(rows) for _, rows in positions)
+        del positions
+        start = time.perf_counter()
+        snapshot.restore(loaded)
+        restore_s = time.perf_counter() - start
+    os.remove(path)
+
+    return {
+        'snapshot': count,
+        'columnar': columnar,
+        'bytes': saved['bytes'],
+        'save_s': save_s,
+        'open_s': open_s,
+        'column_s': column_s,
+        'restore_s': restore_s,
+        'rows': rows,
+        'x_total': x_total,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('scenarios', nargs='*', choices=sorted(SCENARIOS))
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--columnar', action='store_true')
+    parser.add_argument('--parallel', action='store_true')
+    parser.add_argument('--batched-particles', action='store_true')
+    parser.add_argument('--dirty-rects', action='store_true')
+    parser.add_argument('--timestep', type=float, help='simulate in fixed steps of this many seconds')
+    parser.add_argument('--snapshot', type=int, metavar='COUNT',
+                        help='also time saving and loading COUNT entities')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    options = {}
+    for option in ('columnar', 'parallel', 'batched_particles', 'dirty_rects'):
+        if getattr(args, option):
+            options[option] = True
+    if args.timestep:
+        options['timestep'] = args.timestep
+    results = [run(name, args.count, args.frames, args.warmup, args.seed, **options)
+               for name in args.scenarios]
+    if args.snapshot:
+        results.append(run_snapshot(args.snapshot, args.seed, args.columnar))
+    if not results:
+        parser.error('give at least one scenario or --snapshot')
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,7 @@ from typing import Tuple
 import pygame
 from pygame import Vector2
 
+from .modules.esper import Tag
 from .types import AlignmentType
 from .types import ParticleType
 from .types import LayerType
@@ -15,11 +16,21 @@ class Position(Vector2):
     """
     A class to contain the Position data of a single component.
 
+    An attached position is kept at its parent's position plus its offset
+    by the MovementProcessor, parents before children. An unattached one is
+    drawn displaced by its offset.
+
     Attributes:
         x : int
             The x coordinate of the component.
         y : int
             The y coordinate of the component.
+        delta : Vector2
+            The movement to apply on the next MovementProcessor pass.
+        offset : Vector2
+            The offset from the attached entity, or the draw offset.
+        attach : int
+            The entity this position follows, if any.
     """
 
     def __init__(self,
@@ -70,23 +81,11 @@ class Size(Vector2):
         self.y = value
 
 
-class Collider:
+class Collider(Tag):
     """
-    A class to contain the spatial data of a single spatial component.
-
-    Attributes:
-        anchor : AlignmentType
-            The alignment of the component.
-        fixed : bool
-            True if the collider is fixed, False otherwise.
+    A tag marking an entity whose Position and Size take part in collisions.
     """
 
-    def __init__(self,
-                 anchor: AlignmentType = AlignmentType.center,
-                 fixed: bool = False) -> None:
-        self.anchor = anchor
-        self.fixed = fixed
-
 
 class Collision:
     """
@@ -166,6 +165,18 @@ class ParticleEmitter:
             The type of particle.
         spawn_chance : float
             The chance of spawning a new particle.
+        pool_size : int
+            How many dead particles of this emitter to keep for reuse
+            (optional. overrides the ParticleProcessor's pool size).
+        batched : bool
+            Whether particles live in a ParticleBuffer instead of being
+            entities (optional. defaults to the ParticleProcessor's mode).
+        capacity : int
+            The size of the ParticleBuffer when batched.
+        buffer : ParticleBuffer
+            The batched particles, created by the ParticleProcessor.
+        pending_burst : int
+            Particles to spawn at once on the next batched update.
     """
 
     def __init__(self,
@@ -173,7 +184,10 @@ class ParticleEmitter:
                  particle_lifetime: float = 1.0,
                  particle_count: int = None,
                  particle_type: ParticleType = None,
-                 spawn_chance=1.0):
+                 spawn_chance=1.0,
+                 pool_size: int = None,
+                 batched: bool = None,
+                 capacity: int = 1024):
         self.rate = rate
         self.last_spawn = rate
         self.particle_lifetime = particle_lifetime
@@ -181,6 +195,15 @@ class ParticleEmitter:
         self.particle_type = particle_type
         self.particles = set()
         self.spawn_chance = spawn_chance
+        self.pool_size = pool_size
+        self.batched = batched
+        self.capacity = capacity
+        self.buffer = None
+        self.pending_burst = 0
+
+    def burst(self, count: int) -> None:
+        """Spawn `count` batched particles at once on the next update."""
+        self.pending_burst += count
 
 
 class Renderable:
@@ -201,6 +224,7 @@ class Renderable:
     """
 
     paths = {}
+    fills = {}
 
     def __init__(self,
                  size: tuple = None,
@@ -225,20 +249,35 @@ class Renderable:
         else:
             if not self.size:
                 raise AttributeError('missing size attr')
-            self.surface = pygame.Surface(self.size)
-            rand_color = (randint(0, 255),
-                          randint(0, 255),
-                          randint(0, 255))
-            self.surface.fill(color or rand_color)
+            if color:
+                # flat fills of the same size and color share one surface
+                key = tuple(self.size), tuple(color)
+                if key not in self.fills:
+                    self.fills[key] = pygame.Surface(self.size)
+                    self.fills[key].fill(color)
+                self.surface = self.fills[key]
+            else:
+                self.surface = pygame.Surface(self.size)
+                rand_color = (randint(0, 255),
+                              randint(0, 255),
+                              randint(0, 255))
+                self.surface.fill(rand_color)
 
     @property
     def has_image(self) -> bool:
         return self.file_path is not None
 
 
-class PlayerControlled:
-    def __init__(self, speed: float = 4.0):
-        self.speed = speed
+class PlayerControlled(Tag):
+    """
+    A tag marking an entity steered with the keyboard.
+
+    Attributes:
+        speed : float
+            The velocity added per step a key is held, shared by every entity.
+    """
+
+    speed = 4.0
 
 
 class Text:
@@ -259,9 +298,8 @@ class Text:
         self.dirty = True
 
 
-class FollowMouse:
-    def __init__(self, speed: float = 0.0):
-        self.speed = speed
+class FollowMouse(Tag):
+    """A tag marking an entity kept at the mouse position."""
 
 
 class Clickable:
@@ -270,9 +308,30 @@ class Clickable:
         self.pressed = False
         self.pressed_start_time = None
         self.pressed_start = 0.0
+        self.pressed_time = 0.0
+        self.hovered = False
 
 
 class Camera:
+    """
+    A class to contain the view of the RenderProcessor.
+
+    The first Camera in the World is used. Sprites on screen-space layers
+    (LayerType.ui and above) are not affected by it.
+
+    Attributes:
+        position : Vector2
+            The world position at the top left of the view.
+        zoom : float
+            The magnification of the view.
+        target : int
+            The entity to keep centered in the view (optional).
+        offset : Vector2
+            An extra shift of the view, e.g. for screen shake.
+        dirty : bool
+            Whether to re-query every visible sprite on the next frame.
+    """
+
     def __init__(self,
                  position: Tuple[float, float] = (0.0, 0.0),
                  zoom: float = 1.0,
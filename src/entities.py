@@ -3,6 +3,7 @@ from random import randint
 
 from pygame import Vector2
 
+from .components import Camera
 from .components import Clickable
 from .components import FollowMouse
 from .components import ParticleEmitter
@@ -25,6 +26,12 @@ def create_square(world, pos, size):
     )
 
 
+def create_camera(world, target=None, zoom=1.0):
+    return world.create_entity(
+        Camera(zoom=zoom, target=target)
+    )
+
+
 def create_mouse_entity(world):
     return world.create_entity(
         Position(0, 0),
@@ -0,0 +1,132 @@
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+class TransformHierarchy:
+    """
+    The parent/child links between attached Positions, in topological order.
+
+    Each child keeps one parent, and each parent a list of its children. The
+    depth of every linked entity, and a breadth-first `order` of all
+    children, are rebuilt only after links change. Entities caught in an
+    attach cycle get no depth and are never propagated.
+
+    Attributes:
+        parents : dict
+            The entity each child is attached to.
+        children : dict
+            The children attached to each entity.
+        depths : dict
+            The distance of each linked entity from its root, which is 0.
+        order : list
+            Every reachable child, parents before their children.
+        dirty : bool
+            Whether links changed since the depths and order were built.
+    """
+
+    def __init__(self) -> None:
+        self.parents = {}
+        self.children = {}
+        self.depths = {}
+        self.order = []
+        self.dirty = False
+
+    def __contains__(self, ent: int) -> bool:
+        return ent in self.parents or ent in self.children
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def link(self, child: int, parent: Optional[int]) -> None:
+        """Attach a child to a parent, or detach it if the parent is None."""
+        old_parent = self.parents.get(child)
+        if old_parent == parent:
+            return
+        if old_parent is not None:
+            self.unlink(child)
+        if parent:
+            self.parents[child] = parent
+            self.children.setdefault(parent, []).append(child)
+            self.dirty = True
+
+    def unlink(self, child: int) -> None:
+        """Detach a child from its parent, if it has one. Its own children stay."""
+        parent = self.parents.pop(child, None)
+        if parent is None:
+            return
+        siblings = self.children[parent]
+        siblings.remove(child)
+        if not siblings:
+            del self.children[parent]
+        self.dirty = True
+
+    def update_order(self) -> None:
+        """Rebuild the depths and order, breadth first from every root."""
+        parents = self.parents
+        children = self.children
+        depths = self.depths = {}
+        order = self.order = []
+        frontier = [ent for ent in children if ent not in parents]
+        for ent in frontier:
+            depths[ent] = 0
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for parent in frontier:
+                for child in children.get(parent, ()):
+                    depths[child] = depth
+                    next_frontier.append(child)
+            order.extend(next_frontier)
+            frontier = next_frontier
+        self.dirty = False
+
+    def walk(self, moved: Optional[Iterable[int]] = None) -> List[Tuple[int, int]]:
+        """
+        Get the (parent, child) pairs to update after some entities moved, in
+        an order where every parent comes before its children.
+
+        Moved children are included, so a changed offset or link is applied.
+        Each entity appears at most once, however many of its ancestors
+        moved. With no `moved`, every link is returned.
+        """
+        if self.dirty:
+            self.update_order()
+        parents = self.parents
+        if moved is None:
+            return [(parents[child], child) for child in self.order]
+
+        depths = self.depths
+        starts = [ent for ent in moved if ent in depths]
+        if not starts:
+            return []
+        # shallowest first, so a subtree is reached from its highest moved root
+        starts.sort(key=depths.__getitem__)
+        children = self.children
+        visited = set()
+        pairs = []
+        for start in starts:
+            if start in visited:
+                continue
+            visited.add(start)
+            parent = parents.get(start)
+            if parent is not None:
+                pairs.append((parent, start))
+            stack = [start]
+            while stack:
+                parent = stack.pop()
+                for child in children.get(parent, ()):
+                    if child not in visited:
+                        visited.add(child)
+                        pairs.append((parent, child))
+                        stack.append(child)
+        return pairs
+
+    def clear(self) -> None:
+        self.parents.clear()
+        self.children.clear()
+        self.depths.clear()
+        self.order.clear()
+        self.dirty = False
@@ -0,0 +1,231 @@
+"""
+Input sources (live, recording and replaying) and event dispatch.
+
+The App reads input through an input source: once per frame for the frame
+time (`tick`), once per EventProcessor run for events and key state
+(`poll`), and for the mouse position (`mouse`). `LiveInput` reads pygame
+directly. `InputRecorder` does the same but also logs every frame's dt and
+polls to a gzipped JSON lines file, after a header holding the RNG seed and
+the App options. `InputReplay` feeds such a log back, so a session can be
+re-run headless and profiled frame by frame with `src.replay`.
+
+Key state is stored as the pressed scancodes, and the key state and mouse
+position only when they change. Replays are exact as long as the simulation
+only draws from `random` (which also seeds particle buffers) and processors
+run serially; `--parallel` runs may interleave draws differently.
+"""
+import gzip
+import json
+from collections import namedtuple
+from typing import Callable
+from typing import Iterator
+
+import pygame
+
+
+VERSION = 1
+
+InputState = namedtuple('InputState', ['events', 'pressed', 'mouse'])
+
+
+def _to_json(value):
+    if isinstance(value, (tuple, list)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, list):
+        return tuple(_from_json(item) for item in value)
+    return value
+
+
+def _event_record(event) -> list:
+    attributes = {}
+    for name, value in event.dict.items():
+        value = _to_json(value)
+        try:
+            json.dumps(value)
+        except TypeError:
+            continue
+        attributes[name] = value
+    return [event.type, attributes]
+
+
+def _event(record) -> pygame.event.Event:
+    event_type, attributes = record
+    return pygame.event.Event(
+        event_type, {name: _from_json(value) for name, value in attributes.items()})
+
+
+class LiveInput:
+    """Reads input straight from pygame."""
+
+    def tick(self, dt: float) -> float:
+        """Start a frame, returning its dt."""
+        return dt
+
+    def poll(self) -> InputState:
+        """Take the pending events and the current key state and mouse position."""
+        return InputState(pygame.event.get(), pygame.key.get_pressed(), pygame.mouse.get_pos())
+
+    @property
+    def mouse(self) -> tuple:
+        return pygame.mouse.get_pos()
+
+    def close(self) -> None:
+        pass
+
+
+class InputRecorder(LiveInput):
+    """
+    Reads input from pygame and logs it for replay.
+
+    Attributes:
+        path : str
+            The log being written.
+        seed : int
+            The seed the App gave `random`.
+        state : InputState
+            The input of the latest poll.
+        polls : list
+            The polls of the current frame, not yet written.
+    """
+
+    def __init__(self, path: str, seed: int, options: dict = None) -> None:
+        self.path = path
+        self.seed = seed
+        self.file = gzip.open(path, 'wt')
+        self.file.write(json.dumps({'version': VERSION, 'seed': seed,
+                                    'options': options or {}}) + '\n')
+        self.state = InputState([], None, (0, 0))
+        self.dt = None
+        self.polls = []
+        self._keys = None
+        self._mouse = None
+
+    def tick(self, dt: float) -> float:
+        self._write_frame()
+        self.dt = dt
+        return dt
+
+    def poll(self) -> InputState:
+        self.state = state = super().poll()
+        record = {'events': [_event_record(event) for event in state.events]}
+        keys = [scancode for scancode, down in enumerate(state.pressed) if down]
+        if keys != self._keys:
+            record['keys'] = self._keys = keys
+        if state.mouse != self._mouse:
+            self._mouse = state.mouse
+            record['mouse'] = list(state.mouse)
+        self.polls.append(record)
+        return state
+
+    @property
+    def mouse(self) -> tuple:
+        return self.state.mouse
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self._write_frame()
+        self.file.close()
+
+    def _write_frame(self) -> None:
+        if self.dt is not None:
+            self.file.write(json.dumps({'dt': self.dt, 'polls': self.polls}) + '\n')
+        self.polls = []
+
+
+class InputReplay(LiveInput):
+    """
+    Feeds a recorded log back in place of pygame's input.
+
+    Polls are consumed in the order they were recorded; a frame that polls
+    more often than it did when recorded sees no new events.
+
+    Attributes:
+        path : str
+            The log being replayed.
+        seed : int
+            The seed the recording App gave `random`.
+        options : dict
+            The options of the recording App.
+        frames : list
+            The (dt, polls) of every recorded frame.
+        state : InputState
+            The input of the latest poll.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with gzip.open(path, 'rt') as file:
+            header = json.loads(file.readline())
+            if header.get('version') != VERSION:
+                raise ValueError(f'{path} is not a version {VERSION} input log')
+            self.frames = [(frame['dt'], frame['polls']) for frame in map(json.loads, file)]
+        self.seed = header['seed']
+        self.options = header['options']
+        self.state = InputState([], None, (0, 0))
+        self.polls = iter(())
+        self.pressed = pygame.key.ScancodeWrapper([False] * 512)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def replay(self) -> Iterator[float]:
+        """Step through the recorded frames, yielding the dt of each."""
+        for dt, polls in self.frames:
+            self.polls = iter(polls)
+            yield dt
+
+    def poll(self) -> InputState:
+        record = next(self.polls, None)
+        if record is None:
+            self.state = InputState([], self.pressed, self.state.mouse)
+            return self.state
+        if 'keys' in record:
+            pressed = [False] * 512
+            for scancode in record['keys']:
+                pressed[scancode] = True
+            self.pressed = pygame.key.ScancodeWrapper(pressed)
+        mouse = tuple(record['mouse']) if 'mouse' in record else self.state.mouse
+        self.state = InputState([_event(event) for event in record['events']], self.pressed, mouse)
+        return self.state
+
+    @property
+    def mouse(self) -> tuple:
+        return self.state.mouse
+
+
+class EventDispatcher:
+    """
+    Calls the handlers subscribed to each event type, in subscription order.
+
+    Attributes:
+        handlers : dict
+            The handlers of each event type.
+    """
+
+    def __init__(self) -> None:
+        self.handlers = {}
+
+    def subscribe(self, event_type: int, handler: Callable) -> None:
+        """Call a handler with every event of a type."""
+        self.handlers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type: int, handler: Callable) -> None:
+        """Stop calling a handler. Raises ValueError if it was not subscribed."""
+        handlers = self.handlers.get(event_type, [])
+        handlers.remove(handler)
+        if not handlers:
+            del self.handlers[event_type]
+
+    def dispatch(self, event) -> bool:
+        """Pass an event to its type's handlers. Returns whether there were any."""
+        handlers = self.handlers.get(event.type)
+        if not handlers:
+            return False
+        for handler in tuple(handlers):
+            handler(event)
+        return True
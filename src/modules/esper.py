@@ -1,11 +1,21 @@
+import csv as _csv
+import json as _json
+import os as _os
+import threading as _threading
 import time as _time
 
-from functools import lru_cache as _lru_cache
+from collections import deque as _deque
+from collections import namedtuple as _namedtuple
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from itertools import repeat as _repeat
 
 from typing import Any as _Any
+from typing import Callable as _Callable
 from typing import Iterable as _Iterable
 from typing import List as _List
 from typing import Optional as _Optional
+from typing import Sequence as _Sequence
 from typing import Tuple as _Tuple
 from typing import Type as _Type
 from typing import TypeVar as _TypeVar
@@ -16,6 +26,40 @@ version = '1.5'
 _C = _TypeVar('_C')
 _P = _TypeVar('_P')
 
+CacheInfo = _namedtuple('CacheInfo', ['hits', 'misses', 'invalidations', 'currsize'])
+
+# Entity IDs pack a dense index into the low bits and a generation, bumped
+# each time the index is recycled, into the bits above it.
+ENTITY_INDEX_BITS = 20
+ENTITY_INDEX_MASK = (1 << ENTITY_INDEX_BITS) - 1
+ENTITY_GENERATION_MASK = (1 << 12) - 1
+
+# Freed indices wait in a FIFO queue until at least this many are free, so a
+# single index is not recycled (and its generation wrapped) in quick bursts.
+MINIMUM_FREE_INDICES = 1024
+
+
+def entity_index(entity: int) -> int:
+    """Get the dense index part of an Entity ID."""
+    return entity & ENTITY_INDEX_MASK
+
+
+def entity_generation(entity: int) -> int:
+    """Get the generation part of an Entity ID."""
+    return entity >> ENTITY_INDEX_BITS
+
+
+def retire_entity(generations: _List[int], free_indices, entity: int) -> None:
+    """Bump the generation of an Entity ID's index and queue the index for reuse.
+
+    :param generations: The generation of every Entity index, updated in place.
+    :param free_indices: The queue of freed indices, appended to.
+    :param entity: The Entity ID to retire.
+    """
+    index = entity & ENTITY_INDEX_MASK
+    generations[index] = (generations[index] + 1) & ENTITY_GENERATION_MASK
+    free_indices.append(index)
+
 
 class Processor:
     """Base class for all Processors to inherit from.
@@ -26,44 +70,686 @@ class Processor:
     generally want to iterate over entities with one (or more) calls to the
     appropriate world methods there, such as
     `for ent, (rend, vel) in self.world.get_components(Renderable, Velocity):`
+
+    Structural changes made while iterating should go through the
+    Processor's `commands` buffer, which the World applies at a sync point.
+
+    Processors may declare the Component types they `reads` and `writes`,
+    which lets a Scheduler run non-conflicting Processors at the same time.
+    Leaving them as None means the Processor may touch anything.
+
+    With a fixed timestep, `World.process_step` runs the Processors whose
+    `fixed_step` is True and `World.process_frame` runs the rest (such as
+    rendering) once per displayed frame.
     """
 
     priority = 0
     world = _Any
+    commands = None
+    reads = None
+    writes = None
+    fixed_step = True
 
     def process(self, *args, **kwargs):
         raise NotImplementedError
 
 
+class CommandBuffer:
+    """Records structural World changes to be applied later, in one batch.
+
+    Every Processor gets its own buffer as `self.commands`. Creating,
+    deleting and adding or removing Components through it is safe while
+    iterating query results, because nothing changes until the World
+    applies the buffer at its next sync point. Entity IDs are allocated
+    right away, so they can be kept or used in later commands, but the
+    new Entities only show up in queries once the buffer is applied.
+    """
+
+    CREATE = 0
+    CREATE_MANY = 1
+    ADD = 2
+    REMOVE = 3
+    DELETE = 4
+
+    def __init__(self, world: 'World'):
+        self.world = world
+        self._commands = []
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def create_entity(self, *components: _C) -> int:
+        """Record the creation of an Entity, returning its new ID."""
+        entity = self.world._allocate_entity()
+        self._commands.append((self.CREATE, entity, components))
+        return entity
+
+    def create_entities(self, count: int, components) -> _List[int]:
+        """Record a `World.create_entities` batch, returning the new IDs."""
+        self.world._check_columns(count, components)
+        entities = [self.world._allocate_entity() for _ in range(count)]
+        self._commands.append((self.CREATE_MANY, entities, components))
+        return entities
+
+    def add_component(self, entity: int, component_instance: _C, type_alias: _Optional[_Type[_C]] = None) -> None:
+        """Record adding (or replacing) a Component on an Entity."""
+        self._commands.append((self.ADD, entity, (component_instance, type_alias)))
+
+    def remove_component(self, entity: int, component_type: _Type[_C]) -> None:
+        """Record removing a Component from an Entity, by type."""
+        self._commands.append((self.REMOVE, entity, component_type))
+
+    def delete_entity(self, entity: int) -> None:
+        """Record deleting an Entity and all of its Components."""
+        self._commands.append((self.DELETE, entity, None))
+
+    def drain(self) -> list:
+        """Take every recorded command, leaving the buffer empty."""
+        commands, self._commands = self._commands, []
+        return commands
+
+
+class Scheduler:
+    """Runs the Processors of a World in stages, in parallel where it is safe.
+
+    A Processor is placed in the stage after the last higher priority
+    Processor it conflicts with, meaning one of them writes a Component type
+    the other reads or writes. Conflicting Processors therefore keep their
+    priority order, while the Processors within a stage run at the same time
+    on a thread pool. A Processor that does not declare `reads` and `writes`
+    conflicts with everything, so it always runs alone, on the calling
+    thread; this keeps display and event handling on the main thread.
+
+    With `processes=True`, a Processor in a parallel stage that provides a
+    picklable `kernel` function runs it in a process pool instead. The
+    Processor's `kernel_inputs` method receives the `process` arguments and
+    returns the kernel's arguments (or None to run `process` as usual), and
+    its `apply_kernel` method receives the result back on the calling thread.
+    """
+
+    def __init__(self, max_workers: _Optional[int] = None, processes: bool = False):
+        self.max_workers = max_workers
+        self.processes = processes
+        self.stages = []
+        self._planned = None
+        self._plans = {}
+        self._thread_pool = None
+        self._process_pool = None
+
+    @staticmethod
+    def conflicts(processor: Processor, other: Processor) -> bool:
+        """Check if two Processors may not run at the same time."""
+        if None in (processor.reads, processor.writes, other.reads, other.writes):
+            return True
+        writes, other_writes = set(processor.writes), set(other.writes)
+        return bool(writes & (set(other.reads) | other_writes)
+                    or other_writes & set(processor.reads))
+
+    def plan(self, processors: _Sequence[Processor]) -> _List[_List[Processor]]:
+        """Group Processors, given in priority order, into stages.
+
+        :param processors: The Processors to run, highest priority first.
+        :return: A list of stages, each a list of Processors that may run
+                 at the same time.
+        """
+        stages = []
+        stage_of = []
+        for index, processor in enumerate(processors):
+            stage = 0
+            for earlier in range(index):
+                if self.conflicts(processors[earlier], processor):
+                    stage = max(stage, stage_of[earlier] + 1)
+            stage_of.append(stage)
+            if stage == len(stages):
+                stages.append([])
+            stages[stage].append(processor)
+        return stages
+
+    def describe(self) -> str:
+        """Get a readable summary of the last computed stage plan."""
+        return '\n'.join(
+            f'stage {index}: ' + ', '.join(type(processor).__name__ for processor in stage)
+            for index, stage in enumerate(self.stages))
+
+    def run(self, world: 'World', args: tuple, kwargs: dict,
+            processors: _Optional[_Sequence[Processor]] = None) -> None:
+        """Run one frame of a World's Processors (or of a subset), stage by stage."""
+        processors = tuple(world._processors if processors is None else processors)
+        if processors != self._planned:
+            stages = self._plans.get(processors)
+            if stages is None:
+                if len(self._plans) >= 8:
+                    self._plans.clear()
+                stages = self._plans[processors] = self.plan(processors)
+            self.stages = stages
+            self._planned = processors
+
+        for stage in self.stages:
+            if len(stage) == 1:
+                world._run_processor(stage[0], args, kwargs)
+            else:
+                self._run_stage(world, stage, args, kwargs)
+
+            if world.sync_each_processor:
+                for processor in stage:
+                    world.apply_commands(processor.commands)
+
+    def _run_stage(self, world: 'World', stage: _List[Processor], args: tuple, kwargs: dict) -> None:
+        if self._thread_pool is None:
+            self._thread_pool = _ThreadPoolExecutor(self.max_workers)
+
+        running = []
+        for processor in stage:
+            kernel_args = None
+            if self.processes and getattr(processor, 'kernel', None) is not None:
+                kernel_args = processor.kernel_inputs(*args, **kwargs)
+
+            if kernel_args is not None:
+                if self._process_pool is None:
+                    self._process_pool = _ProcessPoolExecutor(self.max_workers)
+                running.append((processor, self._process_pool.submit(processor.kernel, *kernel_args)))
+            else:
+                running.append((None, self._thread_pool.submit(world._run_processor, processor, args, kwargs)))
+
+        for processor, future in running:
+            result = future.result()
+            if processor is not None:
+                processor.apply_kernel(result)
+
+    def shutdown(self) -> None:
+        """Stop the worker pools."""
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown()
+        self._thread_pool = self._process_pool = None
+
+
+class Profiler:
+    """Collects high resolution Processor timings over a rolling window of frames.
+
+    For every Processor, and for whole frames under the name "frame", the
+    last `window` durations are kept (in nanoseconds) together with the
+    number of Entities its queries returned. `stats` summarizes each window
+    as p50/p95/p99/max milliseconds. When an `export_path` is given, a
+    summary is appended to it every `export_interval` seconds, as CSV rows
+    if the path ends in ".csv" or otherwise as one JSON object per line.
+    """
+
+    def __init__(self, window: int = 600, export_path: _Optional[str] = None, export_interval: float = 5.0):
+        self.window = window
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.times = {}
+        self.entities = {}
+        self.frames = 0
+        self._last_export = _time.perf_counter()
+
+    def record(self, name: str, elapsed_ns: int, entities: int = 0) -> None:
+        """Add one timing sample, and how many Entities were iterated during it."""
+        times = self.times.get(name)
+        if times is None:
+            times = self.times[name] = _deque(maxlen=self.window)
+            self.entities[name] = _deque(maxlen=self.window)
+        times.append(elapsed_ns)
+        self.entities[name].append(entities)
+
+    def end_frame(self, elapsed_ns: int) -> None:
+        """Record a whole frame, exporting a summary if the interval has passed."""
+        self.record('frame', elapsed_ns)
+        self.frames += 1
+        if self.export_path and _time.perf_counter() - self._last_export >= self.export_interval:
+            self.export(self.export_path)
+
+    @staticmethod
+    def _percentile(ordered: list, fraction: float) -> int:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def stats(self) -> dict:
+        """Summarize every rolling window.
+
+        :return: A dict mapping each name to its sample count, p50/p95/p99/max
+                 duration in milliseconds, and the Entity count of the
+                 latest sample.
+        """
+        stats = {}
+        for name, times in list(self.times.items()):
+            ordered = sorted(times)
+            if not ordered:
+                continue
+            stats[name] = {
+                'count': len(ordered),
+                'p50_ms': self._percentile(ordered, 0.50) / 1e6,
+                'p95_ms': self._percentile(ordered, 0.95) / 1e6,
+                'p99_ms': self._percentile(ordered, 0.99) / 1e6,
+                'max_ms': ordered[-1] / 1e6,
+                'entities': self.entities[name][-1],
+            }
+        return stats
+
+    def export(self, path: str) -> None:
+        """Append a summary of every rolling window to a CSV or JSON lines file."""
+        stats = self.stats()
+        timestamp = _time.time()
+        if path.endswith('.csv'):
+            new_file = not _os.path.exists(path)
+            with open(path, 'a', newline='') as file:
+                writer = _csv.writer(file)
+                if new_file:
+                    writer.writerow(['time', 'frame', 'name', 'count', 'p50_ms',
+                                     'p95_ms', 'p99_ms', 'max_ms', 'entities'])
+                for name, row in stats.items():
+                    writer.writerow([timestamp, self.frames, name, *row.values()])
+        else:
+            with open(path, 'a') as file:
+                file.write(_json.dumps({'time': timestamp, 'frame': self.frames, 'stats': stats}) + '\n')
+        self._last_export = _time.perf_counter()
+
+
+class Storage:
+    """Base class for alternative Component storage backends.
+
+    A Storage registered for a Component type with `World.set_storage` sees
+    every instance of that type as it is added to, and removed from, the
+    World. `adopt` may return a different object (such as a proxy into
+    packed arrays) which the World then stores in place of the original.
+    """
+
+    def adopt(self, entity: int, component_type: _Type[_C], component: _C) -> _C:
+        return component
+
+    def release(self, entity: int, component_type: _Type[_C], component: _C) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class Tag:
+    """Base class for tag Components, which mark Entities but hold no data.
+
+    Every instance of a tag type is the same object, so creating one does
+    not allocate, and archetype tables store nothing per Entity for it:
+    having the tag is just being in a table whose type set (and signature)
+    includes it. Queries match on tags like on any type, but
+    `get_components` and `try_components` leave them out of the Components
+    they return. Where a single Component is asked for by type, a tag is its
+    shared instance.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls):
+        instance = cls.__dict__.get('_instance')
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+        return instance
+
+
+class _TagColumn:
+    """Stands in for an archetype column of a tag type, without storing any rows."""
+
+    __slots__ = ('instance', 'entities')
+
+    def __init__(self, instance: Tag, entities: list):
+        self.instance = instance
+        self.entities = entities
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __iter__(self):
+        return _repeat(self.instance, len(self.entities))
+
+    def __getitem__(self, row: int) -> Tag:
+        return self.instance
+
+    def __setitem__(self, row: int, component: Tag) -> None:
+        pass
+
+    def append(self, component: Tag) -> None:
+        pass
+
+    def extend(self, components: _Iterable[Tag]) -> None:
+        pass
+
+    def pop(self) -> Tag:
+        return self.instance
+
+
+class ComponentRegistry:
+    """Gives every Component type a small integer ID, for bitmask signatures.
+
+    IDs are handed out in registration order and never change, and a type's
+    bit in a signature is `1 << id`. The World registers types as they are
+    first stored or queried. Each archetype table keeps the signature of its
+    type set, which is also the signature of every Entity in it, so query
+    matching is a couple of bitwise operations. `tag_mask` has the bit of
+    every registered Tag type.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._types = []
+        self._masks = {}
+        self.tag_mask = 0
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def __contains__(self, component_type: _Type[_C]) -> bool:
+        return component_type in self._ids
+
+    @property
+    def types(self) -> _Tuple[type, ...]:
+        """Every registered Component type, in ID order."""
+        return tuple(self._types)
+
+    def get_id(self, component_type: _Type[_C]) -> int:
+        """Get the ID of a Component type, registering it if it is new."""
+        type_id = self._ids.get(component_type)
+        if type_id is None:
+            type_id = self._ids[component_type] = len(self._types)
+            self._types.append(component_type)
+            if issubclass(component_type, Tag):
+                self.tag_mask |= 1 << type_id
+        return type_id
+
+    def get_mask(self, component_types: _Iterable[_Type[_C]]) -> int:
+        """Get the signature of some Component types, registering any new ones."""
+        try:
+            # queries pass the same tuple every time, so it is the usual key
+            return self._masks[component_types]
+        except (KeyError, TypeError):
+            pass
+        key = tuple(component_types)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = 0
+            for component_type in key:
+                mask |= 1 << self.get_id(component_type)
+            self._masks[key] = mask
+        return mask
+
+    def get_types(self, mask: int) -> _List[type]:
+        """Get the Component types in a signature, in ID order."""
+        return [component_type for type_id, component_type in enumerate(self._types)
+                if mask >> type_id & 1]
+
+
+class _Archetype:
+    """A table of all Entities that share the exact same set of Component types.
+
+    Every Component type in the set gets its own column (a plain list), and
+    row `i` of each column belongs to `entities[i]`. Rows are kept dense by
+    moving the last row into the gap whenever an Entity leaves the table.
+    Tag types get a `_TagColumn`, which stores nothing. `mask` is the
+    signature of the type set.
+    """
+
+    __slots__ = ('types', 'mask', 'entities', 'rows', 'columns', 'add_edges', 'remove_edges')
+
+    def __init__(self, types: frozenset, mask: int):
+        self.types = types
+        self.mask = mask
+        self.entities = []
+        self.rows = {}
+        self.columns = {component_type: _TagColumn(component_type(), self.entities)
+                        if issubclass(component_type, Tag) else []
+                        for component_type in types}
+        self.add_edges = {}
+        self.remove_edges = {}
+
+    def append(self, entity: int, components: dict) -> None:
+        """Add an Entity row, taking one Component per column from `components`."""
+        self.rows[entity] = len(self.entities)
+        self.entities.append(entity)
+        for component_type, column in self.columns.items():
+            column.append(components[component_type])
+
+    def extend(self, entities: _Sequence[int], columns: dict) -> None:
+        """Add many Entity rows, taking a whole column per type from `columns`."""
+        start = len(self.entities)
+        self.rows.update(zip(entities, range(start, start + len(entities))))
+        self.entities.extend(entities)
+        for component_type, column in self.columns.items():
+            column.extend(columns[component_type])
+
+    def pop(self, entity: int) -> dict:
+        """Remove an Entity row, returning its Components keyed by type."""
+        row = self.rows.pop(entity)
+        components = {}
+        for component_type, column in self.columns.items():
+            components[component_type] = column[row]
+            column[row] = column[-1]
+            column.pop()
+
+        moved = self.entities.pop()
+        if moved != entity:
+            self.entities[row] = moved
+            self.rows[moved] = row
+
+        return components
+
+
 class World:
     """A World object keeps track of all Entities, Components, and Processors.
 
     A World contains a database of all Entity/Component assignments. The World
     is also responsible for executing all Processors assigned to it for each
     frame of your game.
+
+    Entities are stored in archetype tables, one per unique set of Component
+    types, so queries walk whole matching tables instead of intersecting
+    per-type Entity sets. Tables are keyed by the bitmask signature of their
+    types, from the World's `registry`, and matched against queries with
+    bitwise operations.
+
+    Changes buffered in each Processor's `commands` are applied right after
+    that Processor runs, or, with `sync_each_processor=False`, all together
+    at the end of the frame.
+
+    Pass `timed=True`, or a configured Profiler, to record per-Processor
+    timings in `profiler` (and the latest milliseconds in `process_times`).
     """
 
-    def __init__(self, timed=False):
+    def __init__(self, timed=False, sync_each_processor=True):
         self._processors = []
-        self._next_entity_id = 0
+        self.sync_each_processor = sync_each_processor
+        self._generations = [0]
+        self._free_indices = _deque()
+        self.registry = ComponentRegistry()
+        self._archetypes = {}
         self._components = {}
         self._entities = {}
         self._dead_entities = set()
+        self._storages = {}
+        self._trackers = {}
+        self._pending_invalidation = None
+        self._query_cache = {}
+        self._query_dependents = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_invalidations = 0
+        self._scheduler = None
+        self._step_ns = 0
+        self.profiler = None
         if timed:
+            self.profiler = timed if isinstance(timed, Profiler) else Profiler()
             self.process_times = {}
-            self._process = self._timed_process
+            self._iterated = _threading.local()
+            self._run_processor = self._timed_run_processor
 
     def clear_cache(self) -> None:
-        self.get_component.cache_clear()
-        self.get_components.cache_clear()
+        """Drop every cached query result."""
+        self._query_cache.clear()
+        self._query_dependents.clear()
+
+    def cache_info(self) -> CacheInfo:
+        """Report how well the query cache is doing.
+
+        :return: A CacheInfo tuple of hit, miss and invalidation counts,
+                 plus the number of query results currently cached.
+        """
+        return CacheInfo(self._cache_hits, self._cache_misses,
+                         self._cache_invalidations, len(self._query_cache))
+
+    def _invalidate(self, component_types: _Iterable[_Type[_C]]) -> None:
+        """Drop only the cached queries that include or exclude these Component types."""
+        if self._pending_invalidation is not None:
+            self._pending_invalidation.update(component_types)
+            return
+
+        query_cache = self._query_cache
+        for component_type in component_types:
+            keys = self._query_dependents.pop(component_type, None)
+            if keys:
+                for key in keys:
+                    if query_cache.pop(key, None) is not None:
+                        self._cache_invalidations += 1
+
+    def track_changes(self, *component_types: _Type[_C]) -> set:
+        """Get a set that collects Entities whose Components of these types change.
+
+        The World adds an Entity to the returned set whenever a Component of
+        one of these types is added to or removed from it, when it is deleted,
+        and when `mark_changed` is called for it. The set is never emptied by
+        the World; the caller should clear it once it has consumed the changes.
+
+        :param component_types: The Component types to watch.
+        :return: A set of Entity IDs.
+        """
+        changes = set()
+        for component_type in component_types:
+            self._trackers.setdefault(component_type, []).append(changes)
+        return changes
+
+    def mark_changed(self, entity: int, component_type: _Type[_C]) -> None:
+        """Record that an Entity's Component of this type was modified in place.
+
+        :param entity: The Entity that changed.
+        :param component_type: The type of the modified Component.
+        """
+        for changes in self._trackers.get(component_type, ()):
+            changes.add(entity)
+
+    def mark_all_changed(self, entities: _Iterable[int], component_type: _Type[_C]) -> None:
+        """Record that several Entities' Components of this type were modified in place."""
+        trackers = self._trackers.get(component_type)
+        if trackers:
+            entities = list(entities)
+            for changes in trackers:
+                changes.update(entities)
+
+    def _notify(self, entity: int, component_types: _Iterable[_Type[_C]]) -> None:
+        """Add an Entity to the change trackers of each given Component type."""
+        for component_type in component_types:
+            for changes in self._trackers.get(component_type, ()):
+                changes.add(entity)
+
+    def dump_entities(self) -> _Tuple[_List[int], _List[int], _List[_Tuple[_List[int], dict]]]:
+        """Get everything needed to rebuild the World's Entities with `load_entities`.
+
+        Entities waiting to be deleted are left out, and their IDs are
+        retired in the returned generations and freed indices, as if the
+        deletion had been processed. The returned lists are copies, but the
+        Components in them are the live instances.
+
+        :return: The generation of every Entity index, the queue of freed
+                 indices, and one (entities, columns) batch per archetype,
+                 where columns maps each Component type to a list holding
+                 one Component per Entity.
+        """
+        dead = self._dead_entities
+        batches = []
+        for archetype in self._archetypes.values():
+            if not archetype.entities:
+                continue
+            if dead:
+                rows = [row for row, entity in enumerate(archetype.entities) if entity not in dead]
+                entities = [archetype.entities[row] for row in rows]
+                columns = {component_type: [column[row] for row in rows]
+                           for component_type, column in archetype.columns.items()}
+            else:
+                entities = list(archetype.entities)
+                columns = {component_type: list(column)
+                           for component_type, column in archetype.columns.items()}
+            if entities:
+                batches.append((entities, columns))
+        generations = list(self._generations)
+        free_indices = list(self._free_indices)
+        for entity in dead:
+            retire_entity(generations, free_indices, entity)
+        return generations, free_indices, batches
+
+    def load_entities(self, generations: _Sequence[int], free_indices: _Sequence[int],
+                      batches: _Iterable[_Tuple[_Sequence[int], dict]]) -> None:
+        """Replace every Entity with saved ones, keeping their exact IDs.
+
+        :param generations: The generation of every Entity index.
+        :param free_indices: The queue of freed indices, oldest first.
+        :param batches: (entities, columns) pairs, as from `dump_entities`.
+        """
+        self.clear_database()
+        self._generations = list(generations) or [0]
+        self._free_indices = _deque(free_indices)
+        for entities, columns in batches:
+            self._check_columns(len(entities), columns)
+            self._insert_entities(list(entities), columns)
 
     def clear_database(self) -> None:
         """Remove all Entities and Components from the World."""
-        self._next_entity_id = 0
+        if self._trackers:
+            for entity, archetype in self._entities.items():
+                self._notify(entity, archetype.types)
+
+        # Retire every handed out ID, so none of them can alias a new Entity.
+        self._generations = [(generation + 1) & ENTITY_GENERATION_MASK
+                             for generation in self._generations]
+        self._free_indices = _deque(range(1, len(self._generations)))
         self._dead_entities.clear()
+        self._archetypes.clear()
         self._components.clear()
         self._entities.clear()
         self.clear_cache()
+        for storage in set(self._storages.values()):
+            storage.clear()
+
+    def set_storage(self, component_type: _Type[_C], storage: Storage) -> None:
+        """Store all Components of a type through a Storage backend.
+
+        Components of this type that are already in the World are handed
+        to the Storage immediately.
+
+        :param component_type: The Component type to store.
+        :param storage: A Storage instance.
+        """
+        self._storages[component_type] = storage
+
+        for archetype in self._components.get(component_type, []):
+            column = archetype.columns[component_type]
+            for row, entity in enumerate(archetype.entities):
+                column[row] = storage.adopt(entity, component_type, column[row])
+
+        self._invalidate((component_type,))
+
+    def get_storage(self, component_type: _Type[_C]) -> _Optional[Storage]:
+        """Get the Storage backend for a Component type, if one was set."""
+        return self._storages.get(component_type)
+
+    def _adopt(self, entity: int, components: dict) -> None:
+        """Hand new Components to their Storage, replacing them with what it returns."""
+        for component_type, component in components.items():
+            storage = self._storages.get(component_type)
+            if storage is not None:
+                components[component_type] = storage.adopt(entity, component_type, component)
+
+    def _release(self, entity: int, components: dict) -> None:
+        """Tell each Storage that these Components have left the World."""
+        for component_type, component in components.items():
+            storage = self._storages.get(component_type)
+            if storage is not None:
+                storage.release(entity, component_type, component)
 
     def add_processor(self, processor_instance: Processor, priority=0) -> None:
         """Add a Processor instance to the World.
@@ -75,6 +761,7 @@ class World:
         assert issubclass(processor_instance.__class__, Processor)
         processor_instance.priority = priority
         processor_instance.world = self
+        processor_instance.commands = CommandBuffer(self)
         self._processors.append(processor_instance)
         self._processors.sort(key=lambda proc: proc.priority, reverse=True)
 
@@ -85,7 +772,9 @@ class World:
         """
         for processor in self._processors:
             if type(processor) == processor_type:
+                self.apply_commands(processor.commands)
                 processor.world = None
+                processor.commands = None
                 self._processors.remove(processor)
 
     def get_processor(self, processor_type: _Type[_P]) -> _Optional[_P]:
@@ -108,20 +797,143 @@ class World:
         """Create a new Entity.
 
         This method returns an Entity ID, which is just a plain integer.
+        IDs of deleted Entities are recycled with a new generation, so an
+        old ID never refers to a newer Entity.
         You can optionally pass one or more Component instances to be
         assigned to the Entity.
 
         :param components: Optional components to be assigned to the
                entity on creation.
-        :return: The next Entity ID in sequence.
+        :return: The new Entity ID.
         """
-        self._next_entity_id += 1
+        entity = self._allocate_entity()
+
+        if components:
+            self._insert_entity(entity, components)
 
-        # TODO: duplicate add_component code here for performance
-        for cmp in components:
-            self.add_component(self._next_entity_id, cmp)
+        return entity
+
+    def _insert_entity(self, entity: int, components: _Iterable[_C]) -> None:
+        """Add all Components of a freshly allocated Entity at once."""
+        if components:
+            # Insert straight into the final archetype instead of moving the
+            # Entity through one table per add_component call.
+            component_dict = {type(cmp): cmp for cmp in components}
+            if self._storages:
+                self._adopt(entity, component_dict)
+            archetype = self._get_archetype(component_dict)
+            archetype.append(entity, component_dict)
+            self._entities[entity] = archetype
+            self._invalidate(archetype.types)
+            if self._trackers:
+                self._notify(entity, archetype.types)
+
+    def create_entities(self, count: int, components) -> _List[int]:
+        """Create many Entities in one batch.
+
+        IDs are allocated, storage is filled and cached queries are
+        invalidated once for the whole batch, rather than once per Entity.
+        `components` may be either:
+
+        - a callable, called with the index (0 to count-1) of each new
+          Entity in the batch and returning an iterable of its Components.
+        - a sequence of columns, each holding `count` Component instances of
+          a single type, or a dict mapping Component types to such columns.
+
+        :param count: The number of Entities to create.
+        :param components: A Component factory, or columns of Components.
+        :return: A list of the new Entity IDs.
+        """
+        self._check_columns(count, components)
+        entities = [self._allocate_entity() for _ in range(count)]
+        self._insert_entities(entities, components)
+        return entities
+
+    @staticmethod
+    def _check_columns(count: int, components) -> None:
+        """Raise a ValueError if Component columns don't all hold `count` items."""
+        if not callable(components):
+            for column in (components.values() if isinstance(components, dict) else components):
+                if len(column) != count:
+                    raise ValueError(f'expected columns of {count} components, got {len(column)}')
+
+    def _insert_entities(self, entities: _List[int], components) -> None:
+        """Add the Components of freshly allocated Entities in one batch."""
+        if callable(components):
+            batches = self._create_rows(entities, components)
+        else:
+            batches = self._create_columns(entities, components)
+
+        changed_types = set()
+        for archetype, batch in batches:
+            changed_types.update(archetype.types)
+            if self._trackers:
+                for component_type in archetype.types:
+                    for changes in self._trackers.get(component_type, ()):
+                        changes.update(batch)
+
+        self._invalidate(changed_types)
+
+    def _create_rows(self, entities: _List[int], factory: _Callable[[int], _Iterable[_C]]) -> _List[_Tuple[_Archetype, _List[int]]]:
+        """Insert Entities built one at a time by a factory, grouped by archetype."""
+        batches = {}
+        archetypes = {}
+
+        for index, entity in enumerate(entities):
+            component_dict = {type(cmp): cmp for cmp in factory(index)}
+            if not component_dict:
+                continue
+            if self._storages:
+                self._adopt(entity, component_dict)
+
+            key = tuple(component_dict)
+            archetype = archetypes.get(key)
+            if archetype is None:
+                archetype = archetypes[key] = self._get_archetype(component_dict)
+
+            archetype.append(entity, component_dict)
+            self._entities[entity] = archetype
+            batches.setdefault(archetype, []).append(entity)
+
+        return list(batches.items())
+
+    def _create_columns(self, entities: _List[int], columns) -> _List[_Tuple[_Archetype, _List[int]]]:
+        """Insert Entities whose Components are given as one column per type."""
+        if not entities:
+            return []
+
+        if isinstance(columns, dict):
+            columns = dict(columns)
+        else:
+            columns = {type(column[0]): column for column in columns}
+
+        for component_type, column in columns.items():
+            storage = self._storages.get(component_type)
+            if storage is not None:
+                columns[component_type] = [storage.adopt(entity, component_type, component)
+                                           for entity, component in zip(entities, column)]
+
+        archetype = self._get_archetype(columns)
+        archetype.extend(entities, columns)
+        self._entities.update(dict.fromkeys(entities, archetype))
+        return [(archetype, entities)]
+
+    def _allocate_entity(self) -> int:
+        """Get a fresh Entity ID, recycling a freed index when enough are queued."""
+        free_indices = self._free_indices
+        if len(free_indices) > MINIMUM_FREE_INDICES or (
+                free_indices and len(self._generations) > ENTITY_INDEX_MASK):
+            index = free_indices.popleft()
+        else:
+            index = len(self._generations)
+            if index > ENTITY_INDEX_MASK:
+                raise RuntimeError('out of Entity IDs')
+            self._generations.append(0)
+        return self._generations[index] << ENTITY_INDEX_BITS | index
 
-        return self._next_entity_id
+    def _free_entity(self, entity: int) -> None:
+        """Retire an Entity ID, queueing its index for reuse under a new generation."""
+        retire_entity(self._generations, self._free_indices, entity)
 
     def delete_entity(self, entity: int, immediate=False) -> None:
         """Delete an Entity from the World.
@@ -137,14 +949,14 @@ class World:
         :param immediate: If True, delete the Entity immediately.
         """
         if immediate:
-            for component_type in self._entities[entity]:
-                self._components[component_type].discard(entity)
-
-                if not self._components[component_type]:
-                    del self._components[component_type]
-
-            del self._entities[entity]
-            self.clear_cache()
+            archetype = self._entities.pop(entity)
+            components = archetype.pop(entity)
+            if self._storages:
+                self._release(entity, components)
+            self._invalidate(archetype.types)
+            if self._trackers:
+                self._notify(entity, archetype.types)
+            self._free_entity(entity)
 
         else:
             self._dead_entities.add(entity)
@@ -159,6 +971,20 @@ class World:
         """
         return entity in self._entities and entity not in self._dead_entities
 
+    def is_alive(self, entity: int) -> bool:
+        """Check in O(1) whether an Entity ID is current, even if it has no Components.
+
+        IDs of deleted Entities are stale and return False, even after their
+        index has been recycled for a new Entity.
+
+        :param entity: The Entity ID to check.
+        :return: True if the ID was handed out and has not been deleted.
+        """
+        index = entity & ENTITY_INDEX_MASK
+        return (0 < index < len(self._generations)
+                and self._generations[index] == entity >> ENTITY_INDEX_BITS
+                and entity not in self._dead_entities)
+
     def component_for_entity(self, entity: int, component_type: _Type[_C]) -> _C:
         """Retrieve a Component instance for a specific Entity.
 
@@ -171,7 +997,8 @@ class World:
         :param component_type: The Component instance you wish to retrieve.
         :return: The Component instance requested for the given Entity ID.
         """
-        return self._entities[entity][component_type]
+        archetype = self._entities[entity]
+        return archetype.columns[component_type][archetype.rows[entity]]
 
     def components_for_entity(self, entity: int) -> _Tuple[_C, ...]:
         """Retrieve all Components for a specific Entity, as a Tuple.
@@ -187,7 +1014,9 @@ class World:
         :return: A tuple of all Component instances that have been
         assigned to the passed Entity ID.
         """
-        return tuple(self._entities[entity].values())
+        archetype = self._entities[entity]
+        row = archetype.rows[entity]
+        return tuple(column[row] for column in archetype.columns.values())
 
     def has_component(self, entity: int, component_type: _Type[_C]) -> bool:
         """Check if a specific Entity has a Component of a certain type.
@@ -197,7 +1026,7 @@ class World:
         :return: True if the Entity has a Component of this type,
                  otherwise False
         """
-        return component_type in self._entities[entity]
+        return component_type in self._entities[entity].types
 
     def has_components(self, entity: int, *component_types: _Type[_C]) -> bool:
         """Check if an Entity has all of the specified Component types.
@@ -207,7 +1036,30 @@ class World:
         :return: True if the Entity has all of the Components,
                  otherwise False
         """
-        return all(comp_type in self._entities[entity] for comp_type in component_types)
+        mask = self.registry.get_mask(component_types)
+        return self._entities[entity].mask & mask == mask
+
+    def get_signature(self, entity: int) -> int:
+        """Get the bitmask of an Entity's Component types.
+
+        Raises a KeyError if the given entity does not exist in the database.
+        :param entity: The Entity you are querying.
+        :return: An int with bit `registry.get_id(T)` set for each Component
+                 type T the Entity has.
+        """
+        return self._entities[entity].mask
+
+    def component_counts(self) -> dict:
+        """Count the Entities carrying each registered Component type.
+
+        Entities waiting to be deleted are still counted.
+        :return: A dict mapping every registered Component type, in ID
+                 order, to its number of Entities.
+        """
+        components = self._components
+        return {component_type: sum(len(archetype.entities)
+                                    for archetype in components.get(component_type, ()))
+                for component_type in self.registry.types}
 
     def add_component(self, entity: int, component_instance: _C, type_alias: _Optional[_Type[_C]] = None) -> None:
         """Add a new Component instance to an Entity.
@@ -218,23 +1070,47 @@ class World:
         can optionally provide a custom `type_alias`, for cases where you
         would like to manually override this behavior.
 
+        Raises a KeyError if the Entity ID is stale (the Entity was deleted).
         :param entity: The Entity to associate the Component with.
         :param component_instance: A Component instance.
         :param type_alias: An optional type that the Component instance
                            should be stored as.
         """
         component_type = type_alias or type(component_instance)
+        archetype = self._entities.get(entity)
 
-        if component_type not in self._components:
-            self._components[component_type] = set()
+        if archetype is None and not self.is_alive(entity):
+            raise KeyError(entity)
 
-        self._components[component_type].add(entity)
+        storage = self._storages.get(component_type)
+        if storage is not None:
+            if archetype is not None and component_type in archetype.types:
+                old_instance = archetype.columns[component_type][archetype.rows[entity]]
+                storage.release(entity, component_type, old_instance)
+            component_instance = storage.adopt(entity, component_type, component_instance)
 
-        if entity not in self._entities:
-            self._entities[entity] = {}
+        if archetype is None:
+            archetype = self._get_archetype((component_type,))
+            archetype.append(entity, {component_type: component_instance})
+            self._entities[entity] = archetype
 
-        self._entities[entity][component_type] = component_instance
-        self.clear_cache()
+        elif component_type in archetype.types:
+            archetype.columns[component_type][archetype.rows[entity]] = component_instance
+
+        else:
+            target = archetype.add_edges.get(component_type)
+            if target is None:
+                target = self._get_archetype(archetype.types | {component_type})
+                archetype.add_edges[component_type] = target
+
+            components = archetype.pop(entity)
+            components[component_type] = component_instance
+            target.append(entity, components)
+            self._entities[entity] = target
+
+        self._invalidate((component_type,))
+        if self._trackers:
+            self._notify(entity, (component_type,))
 
     def remove_component(self, entity: int, component_type: _Type[_C]) -> int:
         """Remove a Component instance from an Entity, by type.
@@ -248,29 +1124,74 @@ class World:
         :param entity: The Entity to remove the Component from.
         :param component_type: The type of the Component to remove.
         """
-        self._components[component_type].discard(entity)
+        archetype = self._entities[entity]
+        if component_type not in archetype.types:
+            raise KeyError(component_type)
+
+        components = archetype.pop(entity)
+        component_instance = components.pop(component_type)
 
-        if not self._components[component_type]:
-            del self._components[component_type]
+        storage = self._storages.get(component_type)
+        if storage is not None:
+            storage.release(entity, component_type, component_instance)
 
-        del self._entities[entity][component_type]
+        if components:
+            target = archetype.remove_edges.get(component_type)
+            if target is None:
+                target = self._get_archetype(archetype.types - {component_type})
+                archetype.remove_edges[component_type] = target
 
-        if not self._entities[entity]:
+            target.append(entity, components)
+            self._entities[entity] = target
+
+        else:
             del self._entities[entity]
 
-        self.clear_cache()
+        self._invalidate((component_type,))
+        if self._trackers:
+            self._notify(entity, (component_type,))
         return entity
 
+    def _get_archetype(self, component_types: _Iterable[_Type[_C]]) -> _Archetype:
+        """Get the archetype table for a set of Component types, creating it if needed."""
+        mask = self.registry.get_mask(component_types)
+        archetype = self._archetypes.get(mask)
+
+        if archetype is None:
+            archetype = _Archetype(frozenset(component_types), mask)
+            self._archetypes[mask] = archetype
+            for component_type in archetype.types:
+                self._components.setdefault(component_type, []).append(archetype)
+
+        return archetype
+
+    def _get_archetypes(self, component_types: _Tuple[_Type[_C], ...], exclude: _Iterable[_Type[_C]] = ()) -> _List[_Archetype]:
+        """Get all non-empty archetype tables matching a query.
+
+        :param component_types: Component types every table must contain.
+        :param exclude: Component types no table may contain.
+        :return: A list of matching archetypes, in creation order.
+        """
+        try:
+            candidates = min((self._components[ct] for ct in component_types), key=len)
+        except KeyError:
+            return []
+
+        mask = self.registry.get_mask(component_types)
+        exclude_mask = self.registry.get_mask(exclude)
+        return [archetype for archetype in candidates
+                if archetype.entities
+                and archetype.mask & mask == mask
+                and not archetype.mask & exclude_mask]
+
     def _get_component(self, component_type: _Type[_C]) -> _Iterable[_Tuple[int, _C]]:
         """Get an iterator for Entity, Component pairs.
 
         :param component_type: The Component type to retrieve.
         :return: An iterator for (Entity, Component) tuples.
         """
-        entity_db = self._entities
-
-        for entity in self._components.get(component_type, []):
-            yield entity, entity_db[entity][component_type]
+        for archetype in self._components.get(component_type, []):
+            yield from zip(archetype.entities, archetype.columns[component_type])
 
     def _get_components(self, *component_types: _Type[_C], exclude: _List[_Type[_C]]) -> _Iterable[_Tuple[int, _List[_C]]]:
         """Get an iterator for Entity and multiple Component sets.
@@ -279,22 +1200,64 @@ class World:
         :return: An iterator for Entity, (Component1, Component2, etc)
         tuples.
         """
-        entity_db = self._entities
-        comp_db = self._components
+        # tags only filter, so they get no place in the results
+        data_types = [ct for ct in component_types
+                      if ct not in exclude and not issubclass(ct, Tag)]
+        for archetype in self._get_archetypes(component_types, exclude):
+            columns = [archetype.columns[ct] for ct in data_types]
+            for entity, *components in zip(archetype.entities, *columns):
+                yield entity, components
+
+    def get_component(self, component_type: _Type[_C]) -> _List[_Tuple[int, _C]]:
+        """Get a cached list of Entity, Component pairs.
+
+        The list is reused until a Component of this type is added to or
+        removed from any Entity, so it must not be modified by the caller.
 
+        :param component_type: The Component type to retrieve.
+        :return: A list of (Entity, Component) tuples.
+        """
         try:
-            for entity in set.intersection(*[comp_db[ct] for ct in component_types]).difference(*[comp_db[ct] for ct in exclude]):
-                yield entity, [entity_db[entity][ct] for ct in component_types if ct not in exclude]
+            result = self._query_cache[component_type]
         except KeyError:
-            pass
+            self._cache_misses += 1
+            result = self._query_cache[component_type] = list(self._get_component(component_type))
+            self._query_dependents.setdefault(component_type, set()).add(component_type)
+        else:
+            self._cache_hits += 1
+        if self.profiler is not None:
+            self._count_iterated(len(result))
+        return result
 
-    @_lru_cache()
-    def get_component(self, component_type: _Type[_C]) -> _List[_Tuple[int, _C]]:
-        return [query for query in self._get_component(component_type)]
+    def get_components(self, *component_types: _Type[_C], exclude: _Iterable[_Type[_C]] = ()) -> _List[_Tuple[int, _List[_C]]]:
+        """Get a cached list of Entity and multiple Component sets.
 
-    @_lru_cache()
-    def get_components(self, *component_types: _Type[_C], exclude: _List[_Type[_C]] = []) -> _List[_Tuple[int, _List[_C]]]:
-        return [query for query in self._get_components(*component_types, exclude=exclude)]
+        The list is reused until a Component of one of the included or
+        excluded types is added to or removed from any Entity, so it must
+        not be modified by the caller. Tag types are matched but left out
+        of each Entity's Components.
+
+        :param component_types: Two or more Component types.
+        :param exclude: Component types the Entities must not have.
+        :return: A list of Entity, (Component1, Component2, etc) tuples.
+        """
+        key = (component_types, tuple(exclude))
+        try:
+            result = self._query_cache[key]
+        except KeyError:
+            self._cache_misses += 1
+            result = self._query_cache[key] = list(self._get_components(*component_types, exclude=key[1]))
+            for component_type in component_types + key[1]:
+                self._query_dependents.setdefault(component_type, set()).add(key)
+        else:
+            self._cache_hits += 1
+        if self.profiler is not None:
+            self._count_iterated(len(result))
+        return result
+
+    def _count_iterated(self, count: int) -> None:
+        """Add to the number of Entities the running Processor has queried."""
+        self._iterated.count = getattr(self._iterated, 'count', 0) + count
 
     def try_component(self, entity: int, component_type: _Type[_C]) -> _Optional[_C]:
         """Try to get a single component type for an Entity.
@@ -306,10 +1269,11 @@ class World:
 
         :param entity: The Entity ID to retrieve the Component for.
         :param component_type: The Component instance you wish to retrieve.
-        :return: the single Component instance requested, which is None if the component doesn't exist.
+        :return: the single Component instance requested, which is None if the component or Entity doesn't exist.
         """
-        if component_type in self._entities[entity]:
-            return self._entities[entity][component_type]
+        archetype = self._entities.get(entity)
+        if archetype is not None and component_type in archetype.types:
+            return archetype.columns[component_type][archetype.rows[entity]]
         else:
             return None
 
@@ -321,12 +1285,28 @@ class World:
         optional Components that may or may not exist, without first having
         to query if the entity has the Component types.
 
+        Tag types are matched but left out of the returned Components, as
+        with `get_components`, so the same types unpack the same way and the
+        List is shorter than `component_types` when tags are given. A query
+        of tags alone would match with an empty List, so it raises
+        ValueError instead; use `has_components` for those.
+
         :param entity: The Entity ID to retrieve the Component for.
         :param component_types: The Components types you wish to retrieve.
-        :return: A List containing the multiple Component instances requested, which is empty if the components do not exist.
+        :return: A List containing the multiple Component instances requested, which is None if the components or Entity do not exist.
         """
-        if all(comp_type in self._entities[entity] for comp_type in component_types):
-            return [self._entities[entity][comp_type] for comp_type in component_types]
+        archetype = self._entities.get(entity)
+        mask = self.registry.get_mask(component_types)
+        tags = mask & self.registry.tag_mask
+        if tags and tags == mask:
+            raise ValueError('try_components needs a non-tag type, use has_components for tags')
+        if archetype is not None and archetype.mask & mask == mask:
+            row = archetype.rows[entity]
+            columns = archetype.columns
+            if tags:
+                return [columns[comp_type][row] for comp_type in component_types
+                        if not issubclass(comp_type, Tag)]
+            return [columns[comp_type][row] for comp_type in component_types]
         else:
             return None
 
@@ -337,31 +1317,127 @@ class World:
         `delete_entity` method. If that method is changed, those changes should
         be duplicated here as well.
         """
+        if not self._dead_entities:
+            return
+
+        changed_types = set()
         for entity in self._dead_entities:
+            archetype = self._entities.pop(entity)
+            components = archetype.pop(entity)
+            if self._storages:
+                self._release(entity, components)
+            if self._trackers:
+                self._notify(entity, archetype.types)
+            self._free_entity(entity)
+            changed_types.update(archetype.types)
+
+        self._dead_entities.clear()
+        self._invalidate(changed_types)
 
-            for component_type in self._entities[entity]:
-                self._components[component_type].discard(entity)
+    def apply_commands(self, commands: CommandBuffer) -> None:
+        """Apply every change recorded in a CommandBuffer, in order.
 
-                if not self._components[component_type]:
-                    del self._components[component_type]
+        Cached queries are invalidated once for the whole buffer. Commands
+        aimed at Entities that were deleted after being recorded are skipped.
 
-            del self._entities[entity]
+        :param commands: The CommandBuffer to empty into the World.
+        """
+        if not commands:
+            return
 
-        self._dead_entities.clear()
-        self.clear_cache()
+        self._pending_invalidation = changed_types = set()
+        try:
+            for command, target, payload in commands.drain():
+                if command == CommandBuffer.CREATE:
+                    self._insert_entity(target, payload)
+                elif command == CommandBuffer.CREATE_MANY:
+                    self._insert_entities(target, payload)
+                elif not self.is_alive(target):
+                    continue
+                elif command == CommandBuffer.ADD:
+                    self.add_component(target, *payload)
+                elif command == CommandBuffer.REMOVE:
+                    if target in self._entities and self.has_component(target, payload):
+                        self.remove_component(target, payload)
+                elif target in self._entities:
+                    self.delete_entity(target, immediate=True)
+                else:
+                    self._free_entity(target)
+        finally:
+            self._pending_invalidation = None
+            self._invalidate(changed_types)
+
+    def flush_commands(self) -> None:
+        """Apply the pending CommandBuffers of all Processors, in priority order."""
+        for processor in self._processors:
+            self.apply_commands(processor.commands)
+
+    def set_scheduler(self, scheduler: _Optional[Scheduler]) -> None:
+        """Run Processors through a Scheduler, or one by one again if None."""
+        if self._scheduler is not None and self._scheduler is not scheduler:
+            self._scheduler.shutdown()
+        self._scheduler = scheduler
+
+    def get_scheduler(self) -> _Optional[Scheduler]:
+        return self._scheduler
+
+    def _run_processor(self, processor: Processor, args: tuple, kwargs: dict) -> None:
+        processor.process(*args, **kwargs)
+
+    def _timed_run_processor(self, processor: Processor, args: tuple, kwargs: dict) -> None:
+        """Track Processor execution time, and Entities iterated, for benchmarking."""
+        self._iterated.count = 0
+        start_time = _time.perf_counter_ns()
+        processor.process(*args, **kwargs)
+        process_time = _time.perf_counter_ns() - start_time
+        name = processor.__class__.__name__
+        self.profiler.record(name, process_time, self._iterated.count)
+        self.process_times[name] = process_time / 1e6
 
     def _process(self, *args, **kwargs):
-        for processor in self._processors:
-            processor.process(*args, **kwargs)
+        self._run_processors(self._processors, args, kwargs)
 
-    def _timed_process(self, *args, **kwargs):
-        """Track Processor execution time for benchmarking."""
-        for processor in self._processors:
-            start_time = _time.process_time()
-            processor.process(*args, **kwargs)
-            process_time = int(
-                round((_time.process_time() - start_time) * 1000, 2))
-            self.process_times[processor.__class__.__name__] = process_time
+    def _run_processors(self, processors: _Sequence[Processor], args: tuple, kwargs: dict) -> None:
+        if self._scheduler is not None:
+            self._scheduler.run(self, args, kwargs, processors)
+        else:
+            for processor in processors:
+                self._run_processor(processor, args, kwargs)
+                if self.sync_each_processor:
+                    self.apply_commands(processor.commands)
+        self.flush_commands()
+
+    def _process_phase(self, fixed_step: bool, args: tuple, kwargs: dict) -> int:
+        start_time = _time.perf_counter_ns()
+        self._clear_dead_entities()
+        self._run_processors([processor for processor in self._processors
+                              if processor.fixed_step == fixed_step], args, kwargs)
+        return _time.perf_counter_ns() - start_time
+
+    def process_step(self, *args, **kwargs):
+        """Run one fixed simulation step: every Processor whose `fixed_step` is True.
+
+        Call it as many times per displayed frame as the timestep requires,
+        followed by one `process_frame`. Dead Entities are cleared first, as
+        in `process`.
+
+        :param args: Optional arguments passed to the *process* methods,
+                     usually the fixed timestep.
+        """
+        self._step_ns += self._process_phase(True, args, kwargs)
+
+    def process_frame(self, *args, **kwargs):
+        """Run every Processor whose `fixed_step` is False, once per displayed frame.
+
+        With a profiler, the frame timing recorded includes the simulation
+        steps run since the previous frame.
+
+        :param args: Optional arguments passed to the *process* methods.
+        """
+        elapsed = self._step_ns + self._process_phase(False, args, kwargs)
+        self._step_ns = 0
+        if self.profiler is not None:
+            self.profiler.end_frame(elapsed)
 
     def process(self, *args, **kwargs):
         """Call the process method on all Processors, in order of their priority.
@@ -374,5 +1450,11 @@ class World:
         :param args: Optional arguments that will be passed through to the
                      *process* method of all Processors.
         """
-        self._clear_dead_entities()
-        self._process(*args, **kwargs)
+        if self.profiler is None:
+            self._clear_dead_entities()
+            self._process(*args, **kwargs)
+        else:
+            start_time = _time.perf_counter_ns()
+            self._clear_dead_entities()
+            self._process(*args, **kwargs)
+            self.profiler.end_frame(_time.perf_counter_ns() - start_time)
@@ -0,0 +1,174 @@
+import random
+from collections import namedtuple
+from typing import Optional
+from typing import Sequence
+
+import numpy as np
+
+from .types import ParticleType
+
+
+ParticleStyle = namedtuple('ParticleStyle', ['color', 'speed', 'size', 'gravity'])
+
+PARTICLE_STYLES = {
+    ParticleType.none: ParticleStyle((255, 255, 255), 100, (8, 16), 0),
+    ParticleType.smoke: ParticleStyle((120, 120, 120), 30, (10, 20), -20),
+    ParticleType.fire: ParticleStyle((255, 120, 30), 60, (6, 12), -60),
+    ParticleType.water: ParticleStyle((60, 120, 255), 80, (4, 8), 300),
+    ParticleType.dust: ParticleStyle((170, 140, 100), 40, (2, 5), 20),
+    ParticleType.snow: ParticleStyle((240, 240, 255), 20, (3, 6), 40),
+    ParticleType.fog: ParticleStyle((200, 200, 210), 10, (24, 40), 0),
+    ParticleType.rain: ParticleStyle((100, 140, 255), 20, (2, 4), 600),
+}
+
+
+class ParticlePool:
+    """
+    A free list of dead particles' components, to be reset and reused.
+
+    Attributes:
+        size : int
+            The most component sets the pool keeps.
+        free : list
+            The component sets waiting to be reused.
+        hits : int
+            Spawns served from the pool.
+        misses : int
+            Spawns that had to allocate new components.
+        dropped : int
+            Dead particles discarded because the pool was full.
+    """
+
+    def __init__(self, size: int = 256) -> None:
+        self.size = size
+        self.free = []
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+
+    def acquire(self) -> Optional[Sequence]:
+        """Take a component set to reuse, or None if the pool is empty."""
+        if self.free:
+            self.hits += 1
+            return self.free.pop()
+        self.misses += 1
+        return None
+
+    def release(self, components: Sequence, size: Optional[int] = None) -> None:
+        """Keep a dead particle's components, unless the pool is full."""
+        if len(self.free) < (self.size if size is None else size):
+            self.free.append(components)
+        else:
+            self.dropped += 1
+
+    @property
+    def hit_rate(self) -> float:
+        spawns = self.hits + self.misses
+        return self.hits / spawns if spawns else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'free': len(self.free),
+            'hits': self.hits,
+            'misses': self.misses,
+            'dropped': self.dropped,
+            'hit_rate': self.hit_rate,
+        }
+
+
+class ParticleBuffer:
+    """
+    A fixed-capacity block of particles owned by a single ParticleEmitter.
+
+    Particles live in parallel NumPy arrays rather than as entities. Live
+    particles are always packed into [0, count), so aging, moving and culling
+    them are a handful of whole-array operations.
+
+    Attributes:
+        capacity : int
+            The most particles the buffer can hold.
+        count : int
+            The number of live particles.
+        style : ParticleStyle
+            The color, speed, size range and gravity of the particle type.
+        friction : float
+            The fraction of velocity lost per second, as in PhysicsProcessor.
+        position : numpy.ndarray
+            The (x, y) top left corner of each particle.
+        velocity : numpy.ndarray
+            The (x, y) velocity of each particle.
+        age : numpy.ndarray
+            The age of each particle.
+        lifetime : numpy.ndarray
+            The lifetime of each particle.
+        size : numpy.ndarray
+            The unscaled width and height of each particle.
+    """
+
+    def __init__(self,
+                 capacity: int = 1024,
+                 particle_type: ParticleType = None,
+                 friction: float = 0.99,
+                 seed: int = None) -> None:
+        self.capacity = capacity
+        self.count = 0
+        self.style = PARTICLE_STYLES.get(particle_type, PARTICLE_STYLES[ParticleType.none])
+        self.friction = friction
+        # seeded from `random` so seeding the game's RNG also fixes particles
+        self.rng = np.random.default_rng(
+            random.getrandbits(32) if seed is None else seed)
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.age = np.zeros(capacity)
+        self.lifetime = np.zeros(capacity)
+        self.size = np.zeros(capacity)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def spawn(self, origin: Sequence, count: int, lifetime: float) -> int:
+        """Spawn up to `count` particles around an origin. Returns how many fit."""
+        count = max(min(count, self.capacity - self.count), 0)
+        if not count:
+            return 0
+        style = self.style
+        new = slice(self.count, self.count + count)
+        size = self.rng.integers(style.size[0], style.size[1], count, endpoint=True)
+        self.size[new] = size
+        self.position[new] = np.asarray(origin, dtype=float) - (size // 2)[:, None]
+        self.velocity[new] = self.rng.integers(-style.speed, style.speed, (count, 2),
+                                               endpoint=True)
+        self.age[new] = 0
+        self.lifetime[new] = lifetime
+        self.count += count
+        return count
+
+    def update(self, dt: float) -> None:
+        """Age, move and cull every live particle."""
+        count = self.count
+        if not count:
+            return
+        velocity = self.velocity[:count]
+        velocity *= (1-(self.friction * dt))
+        velocity[:, 1] += self.style.gravity * dt
+        velocity[np.abs(velocity) < 0.001] = 0
+        self.position[:count] += velocity * dt
+        age = self.age[:count]
+        age += dt
+
+        alive = age <= self.lifetime[:count]
+        if alive.all():
+            return
+        keep = np.flatnonzero(alive)
+        self.count = len(keep)
+        for column in (self.position, self.velocity, self.age, self.lifetime, self.size):
+            column[:self.count] = column[keep]
+
+    def scales(self) -> np.ndarray:
+        """The render scale of each live particle, shrinking as it ages."""
+        count = self.count
+        return 1 - (self.age[:count] / self.lifetime[:count])
+
+    def clear(self) -> None:
+        self.count = 0
@@ -1,9 +1,12 @@
+import math
 import random
 from time import time
 
+import numpy as np
 import pygame
 from pygame import Vector2
 
+from .components import Camera
 from .components import Clickable
 from .components import Collider
 from .components import FollowMouse
@@ -15,16 +18,36 @@ from .components import Renderable
 from .components import Text
 from .components import Position
 from .components import Size
+from .events import file_type
+from .hierarchy import TransformHierarchy
+from .inputs import EventDispatcher
+from .inputs import LiveInput
 from .modules.esper import Processor
+from .particles import ParticleBuffer
+from .particles import ParticlePool
+from .rendering import GlyphAtlas
+from .rendering import RenderQueue
+from .rendering import SurfaceCache
+from .snapshot import load_world
+from .snapshot import save_world
+from .spatial import SpatialHash
+from .storage import ColumnStore
 from .types import AlignmentType
+from .types import LayerType
 from .util import char_widths
 
 
 class RenderProcessor(Processor):
 
+    fixed_step = False
     text_surfs = {}
+    # layers drawn in window coordinates, unaffected by the camera
+    screen_layers = frozenset((LayerType.ui, LayerType.cursors))
 
-    def __init__(self):
+    def __init__(self, surface_cache_budget: int = 16 * 1024 * 1024,
+                 scale_step: float = 0.0, dirty_rects: bool = False,
+                 full_redraw_threshold: float = 0.5, max_dirty_rects: int = 64,
+                 cell_size: int = 128):
         super().__init__()
         self.scale = 2.0
         self.size = self.width, self.height = 800, 600
@@ -33,82 +56,386 @@ class RenderProcessor(Processor):
         self.display = pygame.Surface(
             (int(self.width/self.scale), int(self.height/self.scale)))
 
-        self.font_image = pygame.image.load('./src/assets/font.png').convert()
-        self.font_image.set_colorkey((255, 255, 255))
+        self.font = GlyphAtlas(
+            pygame.image.load('./src/assets/font.png').convert_alpha(), char_widths)
 
         self.test_fill = pygame.image.load(
             './src/assets/test_fill.png').convert()
 
-    def process(self, dt) -> None:
-        self.display.fill((30, 10, 30))
+        self.particle_surfs = {}
+        self.surface_cache = SurfaceCache(surface_cache_budget, scale_step)
 
-        layers = {}
+        self.queue = RenderQueue()
+        self.changes = None
+        self.texts = set()
 
-        for ent, (renderable, position, size) in self.world.get_components(Renderable, Position, Size):
-            if not renderable.visible:
+        self.index = SpatialHash(cell_size)
+        self.camera_position = Vector2(0, 0)
+        self.zoom = 1.0
+        self.view = self.window.get_rect()
+
+        self.alpha = 1.0
+        self.step_changes = None
+        self.current = {}
+        self.previous = {}
+
+        self.dirty_rects = dirty_rects
+        self.full_redraw_threshold = full_redraw_threshold
+        self.max_dirty_rects = max_dirty_rects
+        self.full_redraw = True
+        self.particle_rects = []
+        self.profiler_drawn = None
+
+        self.show_profiler = False
+        self.profiler_interval = 0.5
+        self.profiler_surf = None
+        self.profiler_updated = 0.0
+
+    def process(self, dt, alpha: float = 1.0) -> None:
+        if self.previous or alpha != self.alpha:
+            self.alpha = alpha
+            if self.changes is not None:
+                self.changes.update(self.previous)
+        self.update_queue()
+        particles = self.get_particle_blits()
+        if self.dirty_rects:
+            self.present_dirty(particles)
+            return
+        self.queue.damage.clear()
+        self.draw_scene(particles)
+        self.present()
+
+    def record_step(self) -> None:
+        """
+        Remember where entities moved from in the simulation step that just ran,
+        so frames can be drawn between the last two steps with `alpha`.
+        """
+        if self.step_changes is None:
+            self.step_changes = self.world.track_changes(Position)
+            self.current = {ent: (position.x, position.y)
+                            for ent, position in self.world.get_component(Position)}
+            return
+        current = self.current
+        previous = self.previous
+        moved = self.step_changes
+        for ent in [ent for ent in previous if ent not in moved]:
+            # stopped moving, so draw it where it came to rest
+            del previous[ent]
+            if self.changes is not None:
+                self.changes.add(ent)
+        for ent in moved:
+            position = self.world.try_component(ent, Position)
+            if position is None:
+                current.pop(ent, None)
+                previous.pop(ent, None)
                 continue
-            text = self.world.try_component(ent, Text)
-            if text:
-                surf = self.get_text_surf(ent)
+            now = position.x, position.y
+            before = current.get(ent)
+            current[ent] = now
+            if before is not None and before != now:
+                previous[ent] = before
             else:
-                surf = pygame.transform.scale(
-                    renderable.surface,
-                    (max(int(size.width * size.scale), 0),
-                     max(int(size.height * size.scale), 0)))
-
-            anchor = self.get_anchor_offsets(size, surf)
-            actual_pos = position + position.offset + anchor
-            if not self.check_visible(surf, actual_pos):
-                continue
+                previous.pop(ent, None)
+        moved.clear()
+
+    def get_interpolated(self, ent: int, position) -> Vector2:
+        """Get where to draw a position, between the last two simulation steps."""
+        before = self.previous.get(ent)
+        if before is None:
+            return Vector2(position.x, position.y)
+        remaining = 1 - self.alpha
+        return Vector2(position.x + (before[0] - position.x) * remaining,
+                       position.y + (before[1] - position.y) * remaining)
+
+    def update_queue(self) -> None:
+        """
+        Re-queue the sprites of entities whose Renderable, Position, Size or
+        Text changed since the last frame.
+
+        When the camera moves, only the entities the spatial index finds in
+        the new view are re-queued, and sprites that left it are dropped.
+
+        Changing `Renderable.visible` or `Renderable.layer` in place needs a
+        `world.mark_changed(ent, Renderable)` to be picked up.
+        """
+        if self.changes is None:
+            self.changes = self.world.track_changes(Renderable, Position, Size, Text)
+            self.changes.update(ent for ent, _ in self.world.get_component(Renderable))
+        changes = self.changes
+        for ent in self.texts:
+            text = self.world.try_component(ent, Text)
+            if text is None or text.dirty:
+                changes.add(ent)
+        moved = self.update_camera()
+        if not changes and not moved:
+            return
 
-            layers.setdefault(renderable.layer, []).append((surf, actual_pos))
+        for ent in changes:
+            self.queue_sprite(ent)
 
-        self.display.blit(self.test_fill, (0, 0))
+        if moved:
+            in_view = self.index.query(self.view)
+            for ent in in_view:
+                if ent not in changes:
+                    self.queue_sprite(ent)
+            screen_layers = self.screen_layers
+            for ent in [ent for ent, (layer, _) in self.queue.slots.items()
+                        if ent not in in_view and layer not in screen_layers]:
+                self.queue.remove(ent)
+        changes.clear()
 
-        for layer in sorted(layers):
-            for surf, pos in layers[layer]:
-                self.display.blit(
-                    surf, (int(pos.x/self.scale), int(pos.y/self.scale))
-                )
+    def queue_sprite(self, ent: int) -> None:
+        """Index an entity's world rect, and queue its sprite if it is on screen."""
+        components = self.world.try_components(ent, Renderable, Position, Size)
+        if not components or not components[0].visible:
+            self.queue.remove(ent)
+            self.index.remove(ent)
+            self.texts.discard(ent)
+            return
+        renderable, position, size = components
+
+        text = self.world.try_component(ent, Text)
+        if text:
+            source = self.get_text_surf(ent)
+            width, height = source.get_size()
+            scale = 1.0
+            self.texts.add(ent)
+        else:
+            source = renderable.surface
+            width, height, scale = size.width, size.height, size.scale
+            self.texts.discard(ent)
+
+        drawn_at = self.get_interpolated(ent, position)
+        x = drawn_at.x
+        y = drawn_at.y
+        if not position.attach:
+            # attached positions already include their offset
+            x += position.offset.x
+            y += position.offset.y
+        if renderable.layer in self.screen_layers:
+            self.index.remove(ent)
+            zoom = 1.0
+        else:
+            anchor = self.get_anchor_offsets(size, width * scale, height * scale)
+            self.index.update(ent, pygame.Rect(
+                int(x + anchor.x), int(y + anchor.y),
+                math.ceil(width * scale) + 1, math.ceil(height * scale) + 1))
+            zoom = self.zoom
+            x = (x - self.camera_position.x) * zoom
+            y = (y - self.camera_position.y) * zoom
+
+        # cull before any scaling work
+        screen_width, screen_height = self.surface_cache.get_size(width, height, scale * zoom)
+        anchor = self.get_anchor_offsets(size, screen_width, screen_height)
+        x += anchor.x
+        y += anchor.y
+        if not self.check_visible(x, y, screen_width, screen_height):
+            self.queue.remove(ent)
+            return
+
+        surf = self.surface_cache.scale(source, width, height, scale * zoom)
+        self.queue.put(ent, renderable.layer, surf,
+                       (int(x/self.scale), int(y/self.scale)))
+
+    def update_camera(self) -> bool:
+        """
+        Follow the Camera's target and update the view. Returns whether the
+        view moved or zoomed.
+
+        Without a Camera the view is the window at (0, 0), unzoomed.
+        """
+        camera = None
+        for _, camera in self.world.get_component(Camera):
+            break
+        if camera is None:
+            position, zoom = Vector2(0, 0), 1.0
+        else:
+            zoom = camera.zoom
+            if camera.target is not None:
+                target = self.world.try_component(camera.target, Position)
+                if target is not None:
+                    center = self.get_interpolated(camera.target, target)
+                    size = self.world.try_component(camera.target, Size)
+                    if size is not None:
+                        center += Vector2(size.width, size.height) * size.scale / 2
+                    camera.position.update(
+                        center - Vector2(self.width, self.height) / zoom / 2)
+            position = camera.position + camera.offset
 
+        moved = position != self.camera_position or zoom != self.zoom
+        if camera is not None and camera.dirty:
+            moved = True
+            camera.dirty = False
+        if moved:
+            self.camera_position = position
+            self.zoom = zoom
+            self.view = pygame.Rect(
+                int(position.x) - 1, int(position.y) - 1,
+                math.ceil(self.width / zoom) + 2, math.ceil(self.height / zoom) + 2)
+        return moved
+
+    def to_world(self, pos) -> Vector2:
+        """Convert a window position to world coordinates through the camera."""
+        return Vector2(pos) / self.zoom + self.camera_position
+
+    def draw_scene(self, particles: list, area: pygame.Rect = None) -> None:
+        """Draw the background, particles and queued sprites, optionally clipped to an area."""
+        display = self.display
+        display.set_clip(area)
+        display.fill((30, 10, 30))
+        display.blit(self.test_fill, (0, 0))
+        for blits, rect in particles:
+            if area is None or area.colliderect(rect):
+                display.blits(blits, doreturn=False)
+        layers = self.queue.layers
+        for layer in self.queue.order:
+            display.blits(layers[layer], doreturn=False)
+        display.set_clip(None)
+
+    def present(self) -> None:
         self.window.blit(pygame.transform.scale(
             self.display, self.size), (0, 0))
 
+        self.draw_profiler()
+
         pygame.display.flip()
 
-    def get_text_surf(self, ent: int) -> pygame.Surface:
-        chars = list(char_widths.keys())
+    def present_dirty(self, particles: list) -> None:
+        """
+        Redraw and present only the regions that changed since the last frame.
+
+        The render queue damages a sprite's old and new rects when it appears,
+        disappears, moves or changes surface. Falls back to a full redraw when
+        the damage covers more than `full_redraw_threshold` of the display.
+        """
+        damage = self.queue.damage + [rect for _, rect in particles] + self.particle_rects
+        self.queue.damage.clear()
+        self.particle_rects = [rect for _, rect in particles]
+
+        # the overlay is alpha blended onto the window, so it needs a clean redraw under it
+        profiler_surf = self.update_profiler()
+        if profiler_surf is not self.profiler_drawn:
+            self.full_redraw = True
+        elif profiler_surf is not None:
+            width, height = profiler_surf.get_size()
+            damage.append(pygame.Rect(0, 0, math.ceil((width + 4) / self.scale),
+                                      math.ceil((height + 4) / self.scale)))
+        self.profiler_drawn = profiler_surf
 
-        for ent in self.text_surfs:
-            if not self.world.entity_exists(ent):
-                del self.text_surfs[ent]
+        bounds = self.display.get_rect()
+        damage = [rect.clip(bounds) for rect in damage]
+        damage = [rect for rect in damage if rect.width and rect.height]
+        area = sum(rect.width * rect.height for rect in damage)
+        if self.full_redraw or area > self.full_redraw_threshold * bounds.width * bounds.height:
+            self.full_redraw = False
+            self.draw_scene(particles)
+            self.present()
+            return
+        if not damage:
+            return
+        if len(damage) > self.max_dirty_rects:
+            damage = [damage[0].unionall(damage[1:])]
+
+        updated = []
+        for rect in damage:
+            self.draw_scene(particles, rect)
+            window_rect = self.to_window(rect)
+            self.window.blit(pygame.transform.scale(
+                self.display.subsurface(rect), window_rect.size), window_rect)
+            updated.append(window_rect)
+        self.draw_profiler()
+        pygame.display.update(updated)
+
+    def to_window(self, rect: pygame.Rect) -> pygame.Rect:
+        """Convert a display rect to the window rect it is scaled onto."""
+        scale = self.scale
+        left, top = int(rect.left * scale), int(rect.top * scale)
+        return pygame.Rect(left, top,
+                           math.ceil(rect.right * scale) - left,
+                           math.ceil(rect.bottom * scale) - top)
+
+    def get_particle_blits(self) -> list:
+        """Get a blits sequence and bounding rect for every emitter's batched particles."""
+        batches = []
+        bounds = np.array(self.display.get_size())
+        for ent, emitter in self.world.get_component(ParticleEmitter):
+            buffer = emitter.buffer
+            if not buffer:
+                continue
+            sizes = np.maximum(
+                buffer.size[:buffer.count] * buffer.scales() * self.zoom, 0).astype(int)
+            positions = ((buffer.position[:buffer.count] - self.camera_position)
+                         * self.zoom / self.scale).astype(int)
+            visible = ((sizes > 0)
+                       & (positions + sizes[:, None] >= 0).all(axis=1)
+                       & (positions < bounds).all(axis=1))
+            if not visible.any():
+                continue
+            sizes = sizes[visible]
+            positions = positions[visible]
+            surfs = self.get_particle_surfs(buffer.style.color, int(sizes.max()))
+            left, top = positions.min(axis=0).tolist()
+            right, bottom = (positions + sizes[:, None]).max(axis=0).tolist()
+            batches.append((
+                [(surfs[size], position) for size, position
+                 in zip(sizes.tolist(), positions.tolist())],
+                pygame.Rect(left, top, right - left, bottom - top)))
+        return batches
+
+    def get_particle_surfs(self, color: tuple, size: int) -> list:
+        """Get square surfaces of a color, indexed by their size."""
+        surfs = self.particle_surfs.get(color)
+        if surfs is None:
+            surfs = self.particle_surfs[color] = [None]
+        while len(surfs) <= size:
+            surf = pygame.Surface((len(surfs), len(surfs)))
+            surf.fill(color)
+            surfs.append(surf)
+        return surfs
 
+    def update_profiler(self) -> pygame.Surface:
+        """Get the profiler overlay, re-rendered a few times a second, or None if hidden."""
+        if not self.show_profiler or self.world.profiler is None:
+            return None
+        now = time()
+        if self.profiler_surf is None or now - self.profiler_updated >= self.profiler_interval:
+            self.profiler_surf = self.render_profiler(self.world.profiler.stats())
+            self.profiler_updated = now
+        return self.profiler_surf
+
+    def draw_profiler(self) -> None:
+        """Overlay the World's profiler stats."""
+        surf = self.update_profiler()
+        if surf is not None:
+            self.window.blit(surf, (4, 4))
+
+    def render_profiler(self, stats: dict) -> pygame.Surface:
+        font = pygame.font.Font(None, 16)
+        lines = ['name                  p50    p95    p99    max  ents']
+        for name, row in stats.items():
+            lines.append(
+                f"{name[:20]:<20} {row['p50_ms']:6.2f} {row['p95_ms']:6.2f} "
+                f"{row['p99_ms']:6.2f} {row['max_ms']:6.2f} {row['entities']:5d}")
+        line_height = font.get_linesize()
+        width = max(font.size(line)[0] for line in lines) + 8
+        surf = pygame.Surface((width, line_height * len(lines) + 8), pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 160))
+        for index, line in enumerate(lines):
+            surf.blit(font.render(line, True, (255, 255, 255)),
+                      (4, 4 + index * line_height))
+        return surf
+
+    def get_text_surf(self, ent: int) -> pygame.Surface:
         text = self.world.component_for_entity(ent, Text)
         if ent not in self.text_surfs or text.dirty:
-            string = text.string
-            width = max(sum(char_widths.get(c, 3)+1 for c in string), 1)
-            height = self.font_image.get_height()
-            x, y = 0, 0
-            surf = pygame.Surface((width, height)).convert_alpha()
-            for char in str(string):
-                if char == ' ':
-                    x += 3
-                    continue
-                char_width = char_widths[char]
-                surf.blit(
-                    self.font_image, (x, y),
-                    (sum(char_widths[c]+1 for c in chars[:chars.index(char)]), 0,
-                        char_width, height))
-                x += char_width + 1
-            self.text_surfs[ent] = surf
+            for dead_ent in [e for e in self.text_surfs if not self.world.is_alive(e)]:
+                del self.text_surfs[dead_ent]
+            self.text_surfs[ent] = self.font.render(str(text.string), text.color)
             text.dirty = False
-
-        self.color_surface(self.text_surfs[ent], *text.color)
         return self.text_surfs[ent]
 
-    def get_anchor_offsets(self, size: object, surface: pygame.Surface) -> Vector2:
+    def get_anchor_offsets(self, size: object, width: float, height: float) -> Vector2:
         offset = Vector2(0, 0)
-        width, height = surface.get_width(), surface.get_height()
         if size.anchor == AlignmentType.top_center:
             offset.x -= width / 2
         elif size.anchor == AlignmentType.top_right:
@@ -131,51 +458,174 @@ class RenderProcessor(Processor):
             offset.y -= height
         return offset
 
-    def color_surface(self, surface: pygame.Surface, red: int, green: int, blue: int) -> None:
-        arr = pygame.surfarray.pixels3d(surface)
-        arr[:, :, 0] = red
-        arr[:, :, 1] = green
-        arr[:, :, 2] = blue
-
-    def check_visible(self, surf: pygame.Surface, pos: Vector2) -> bool:
-        surf_rect = surf.get_rect()
+    def check_visible(self, x: float, y: float, width: int, height: int) -> bool:
         window_rect = self.window.get_rect()
         return (
-            pos.x + surf_rect.width >= window_rect.x
-            and pos.y + surf_rect.height >= window_rect.y
-            and pos.x <= window_rect.x + window_rect.width
-            and pos.y <= window_rect.y + window_rect.height
+            x + width >= window_rect.x
+            and y + height >= window_rect.y
+            and x <= window_rect.x + window_rect.width
+            and y <= window_rect.y + window_rect.height
         )
 
 
 class MovementProcessor(Processor):
+    reads = (FollowMouse,)
+    writes = (Position,)
+
+    def __init__(self, input_source: LiveInput = None):
+        super().__init__()
+        self.input = input_source or LiveInput()
+        self.hierarchy = TransformHierarchy()
+        self.changes = None
+        self.full_pass = True
+
     def process(self, dt: float):
+        if self.changes is None:
+            self.changes = self.world.track_changes(Position)
+        store = self.world.get_storage(Position)
+        if isinstance(store, ColumnStore):
+            self.process_columns(store)
+        else:
+            self.process_objects()
+        if self.full_pass:
+            self.propagate()
+            self.changes.clear()
+            self.full_pass = False
+        else:
+            self.propagate(self.changes)
+
+    def reset(self):
+        """Forget every link, such as after the World's entities are replaced."""
+        self.hierarchy.clear()
+        self.full_pass = True
+
+    def process_objects(self):
+        """Apply every Position delta, follow the mouse and sync attach links."""
+        hierarchy = self.hierarchy
+        parents = hierarchy.parents
+        following = {ent for ent, _ in self.world.get_component(FollowMouse)}
         for ent, position in self.world.get_component(Position):
-            position.x += position.delta.x
-            position.y += position.delta.y
+            if position.delta.x or position.delta.y:
+                position.x += position.delta.x
+                position.y += position.delta.y
+                self.world.mark_changed(ent, Position)
+
+            if position.attach != parents.get(ent):
+                hierarchy.link(ent, position.attach)
+                self.world.mark_changed(ent, Position)
 
-            if self.world.try_component(ent, FollowMouse):
-                pos = pygame.mouse.get_pos()
+            if ent in following:
+                pos = self.input.mouse
                 position.x = pos[0]
                 position.y = pos[1]
+                self.world.mark_changed(ent, Position)
                 continue
-            if position.attach:
-                attach_position = self.world.try_component(
-                    position.attach, Position)
-                if attach_position:
-                    position.x = attach_position.x
-                    position.y = attach_position.y
 
             position.delta.x = 0
             position.delta.y = 0
 
+    def process_columns(self, store: ColumnStore):
+        """Apply every Position delta at once, follow the mouse and sync attach links."""
+        mask = store.mask(Position)
+        positions = store.position[:store.length]
+        deltas = store.delta[:store.length]
+        positions[mask] += deltas[mask]
+        moved = mask & deltas.any(axis=1)
+
+        hierarchy = self.hierarchy
+        parents = hierarchy.parents
+        attach = store.attach[:store.length]
+        entities = store.entities[:store.length]
+        for child, parent in list(parents.items()):
+            slot = store.slots.get(child)
+            if slot is not None and not attach[slot]:
+                hierarchy.unlink(child)
+                moved[slot] = True
+        for slot in np.flatnonzero(attach * mask):
+            ent = int(entities[slot])
+            if parents.get(ent) != attach[slot]:
+                hierarchy.link(ent, int(attach[slot]))
+                moved[slot] = True
+
+        for ent, (position,) in self.world.get_components(FollowMouse, Position):
+            pos = self.input.mouse
+            position.x = pos[0]
+            position.y = pos[1]
+            mask[store.slots[ent]] = False
+            moved[store.slots[ent]] = True
+
+        deltas[mask] = 0
+        self.world.mark_all_changed(entities[moved].tolist(), Position)
+
+    def propagate(self, changes: set = None):
+        """
+        Move attached entities to their parent's position plus their offset.
+
+        Only the subtrees under entities whose Position changed since the
+        last pass are updated, parents first, so every level of a tree
+        settles in one pass. With no `changes`, every link is updated.
+        """
+        hierarchy = self.hierarchy
+        try_component = self.world.try_component
+        moved = None
+        if changes is not None:
+            moved = changes.intersection(hierarchy.parents)
+            moved.update(changes.intersection(hierarchy.children))
+            changes.clear()
+            for ent in moved:
+                if try_component(ent, Position) is None:
+                    hierarchy.unlink(ent)
+            if not moved:
+                return
+
+        positions = {}
+        updated = []
+        for parent, child in hierarchy.walk(moved):
+            parent_position = positions.get(parent)
+            if parent_position is None:
+                parent_position = positions[parent] = try_component(parent, Position)
+                if parent_position is None:
+                    continue
+            position = positions[child] = try_component(child, Position)
+            if position is None:
+                continue
+            position.x = parent_position.x + position.offset.x
+            position.y = parent_position.y + position.offset.y
+            updated.append(child)
+        self.world.mark_all_changed(updated, Position)
+        if changes is not None:
+            # our own updates are not moves to propagate next time
+            changes.difference_update(updated)
+
+
+def integrate_velocities(velocities: np.ndarray, friction: float, dt: float):
+    """
+    Apply friction and the resting threshold to a block of velocities.
+
+    Returns the new velocities and the position deltas they produce. This is
+    a pure function, so a Scheduler can run it in a process pool.
+    """
+    velocities = velocities * (1-(friction * dt))
+    velocities[np.abs(velocities) < 0.001] = 0
+    return velocities, velocities * dt
+
 
 class PhysicsProcessor(Processor):
+    reads = ()
+    writes = (Physics, Position)
+    kernel = staticmethod(integrate_velocities)
+
     def __init__(self, friction: float = 0.99):
         super().__init__()
         self.friction = friction
+        self.slots = None
 
     def process(self, dt: float):
+        kernel_args = self.kernel_inputs(dt)
+        if kernel_args is not None:
+            self.apply_kernel(self.kernel(*kernel_args))
+            return
+
         for ent, (physics, position) in self.world.get_components(Physics, Position):
             physics.velocity *= (1-(self.friction * dt))
 
@@ -186,156 +636,433 @@ class PhysicsProcessor(Processor):
 
             position.delta += physics.velocity * dt
 
+    def kernel_inputs(self, dt: float):
+        """Gather every body's velocity row, when bodies live in a ColumnStore."""
+        store = self.world.get_storage(Physics)
+        if not (isinstance(store, ColumnStore) and store is self.world.get_storage(Position)):
+            return None
+        self.slots = np.flatnonzero(store.mask(Physics, Position))
+        return store.velocity[self.slots], self.friction, dt
+
+    def apply_kernel(self, result):
+        velocities, deltas = result
+        store = self.world.get_storage(Physics)
+        store.velocity[self.slots] = velocities
+        store.delta[self.slots] += deltas
+
 
 class CollisionProcessor(Processor):
+    reads = (Size, Collider)
+    writes = (Position,)
+
+    def __init__(self, cell_size: int = 64):
+        super().__init__()
+        self.grid = SpatialHash(cell_size)
+        self.rects = {}
+        self.changes = None
+
     def process(self, dt: float):
+        moving = [
+            (ent, position)
+            for ent, (position, _) in self.world.get_components(Position, Size, Collider)
+            if position.delta.x or position.delta.y]
+        if not moving:
+            # the grid only matters once something moves, so changes wait until then
+            return
+        self.update_grid()
+
+        rects = self.rects
         processed = set()
-        for ent, (position, size, _) in self.world.get_components(Position, Size, Collider):
-            if not position.delta.x or not position.delta.y:
-                # if the entity hasnt moved since last frame, ignore it
+        for ent, position in moving:
+            if ent not in rects:
+                # deleted since the query was cached, so update_grid dropped it
                 continue
-            for other_ent, (other_position, other_size, _) in self.world.get_components(Position, Size, Collider):
-                key = str(sorted([ent, other_ent]))
-                if ent == other_ent or key in processed:
+            swept = rects[ent].union(rects[ent].move(position.delta.x, position.delta.y))
+            for other_ent in self.grid.query(swept):
+                if ent == other_ent:
+                    continue
+                other_rect = rects[other_ent]
+                if not swept.colliderect(other_rect):
+                    continue
+                key = ent << 32 | other_ent if ent < other_ent else other_ent << 32 | ent
+                if key in processed:
                     continue
 
-                rect = self.get_collider_rect(position, size)
-                other_rect = self.get_collider_rect(other_position, other_size)
+                processed.add(key)
+                rect = rects[ent].copy()
+                if rect.colliderect(other_rect):
+                    # already overlapping, so there is no approach to clip
+                    continue
 
-                # TODO: handle collisions
-                # get the direction of each position's movement
+                # clip the move one axis at a time, x first
                 rect.x += position.delta.x
                 if rect.colliderect(other_rect):
-                    moving_right = position.delta.x > 0
-                    moving_left = position.delta.x < 0
-                    if moving_right and rect.right > other_rect.left:
+                    if position.delta.x > 0:
                         rect.right = other_rect.left
-                    if moving_left and rect.left < other_rect.right:
+                    elif position.delta.x < 0:
                         rect.left = other_rect.right
+                    position.delta.x = rect.x - position.x
 
                 rect.y += position.delta.y
                 if rect.colliderect(other_rect):
-                    moving_up = position.delta.y > 0
-                    moving_down = position.delta.y < 0
-                    if moving_up and rect.top > other_rect.bottom:
-                        rect.top = other_rect.bottom
-                    if moving_down and rect.bottom < other_rect.top:
+                    if position.delta.y > 0:
                         rect.bottom = other_rect.top
-                position.delta.x = rect.x - position.x
-                position.delta.y = rect.y - position.y
+                    elif position.delta.y < 0:
+                        rect.top = other_rect.bottom
+                    position.delta.y = rect.y - position.y
 
-                processed.add(key)
+    def update_grid(self):
+        """Re-bucket only the colliders that moved, resized, appeared or died."""
+        if self.changes is None:
+            self.changes = self.world.track_changes(Position, Size, Collider)
+            self.changes.update(
+                ent for ent, _ in self.world.get_components(Position, Size, Collider))
+
+        for ent in self.changes:
+            if (self.world.entity_exists(ent)
+                    and self.world.has_components(ent, Position, Size, Collider)):
+                position, size = self.world.try_components(ent, Position, Size)
+                rect = self.rects[ent] = self.get_collider_rect(position, size)
+                self.grid.update(ent, rect)
+            else:
+                self.rects.pop(ent, None)
+                self.grid.remove(ent)
+        self.changes.clear()
 
     def get_collider_rect(self, position: Position, size: Size) -> pygame.Rect:
         return pygame.Rect(position.x, position.y, size.width * size.scale, size.height * size.scale)
 
 
 class ParticleProcessor(Processor):
+    reads = (Position,)
+    writes = (ParticleEmitter, Particle, Size)
     particles = {}
+    particle_components = (Position, Size, Particle, Renderable, Physics)
+
+    def __init__(self, pool_size: int = 256, pool_sizes: dict = None,
+                 batched: bool = False, friction: float = 0.99):
+        super().__init__()
+        self.pool_size = pool_size
+        self.pool_sizes = pool_sizes or {}
+        self.pools = {}
+        self.batched = batched
+        self.friction = friction
 
     def process(self, dt: float):
+        spawning = []
         for ent, (position, emitter) in self.world.get_components(Position, ParticleEmitter):
+            if self.batched if emitter.batched is None else emitter.batched:
+                self.process_buffer(position, emitter, dt)
+                continue
             emitter.last_spawn += dt
             if emitter.last_spawn >= emitter.rate and (
                 not emitter.particle_count
-                or len(self.emitters.get(ent, set())) < emitter.particle_count
+                or len(emitter.particles) < emitter.particle_count
             ):
-                particle_ent = self.spawn_particle(ent, position, emitter)
+                if random.random() < emitter.spawn_chance:
+                    spawning.append((position, emitter))
+                emitter.last_spawn = 0
+
+        if spawning:
+            # every emitter's particle for this frame goes in one batch
+            particle_ents = self.commands.create_entities(
+                len(spawning), lambda index: self.spawn_particle(*spawning[index]))
+            for particle_ent, (_, emitter) in zip(particle_ents, spawning):
                 emitter.particles.add(particle_ent)
                 self.particles[particle_ent] = emitter
-                emitter.last_spawn = 0
 
         for ent, (particle, position, size) in self.world.get_components(Particle, Position, Size):
             particle.age += dt
             if particle.age > particle.lifetime:
-                if ent in self.particles:
-                    self.particles[ent].particles.remove(ent)
-                    del self.particles[ent]
-                self.world.delete_entity(ent)
+                emitter = self.particles.pop(ent, None)
+                if emitter:
+                    emitter.particles.remove(ent)
+                self.release_particle(ent, particle, emitter)
+                self.commands.delete_entity(ent)
                 continue
             size.scale = 1 - (particle.age / particle.lifetime)
+            self.world.mark_changed(ent, Size)
 
-    def spawn_particle(self, ent, position, emitter):
+    def process_buffer(self, position, emitter, dt: float):
+        """Spawn and update an emitter's batched particles."""
+        buffer = emitter.buffer
+        if buffer is None:
+            buffer = emitter.buffer = ParticleBuffer(
+                emitter.capacity, emitter.particle_type, self.friction)
+
+        buffer.update(dt)
+
+        # every spawn owed since the last frame, not just one per frame
+        emitter.last_spawn += dt
+        due = 0
+        if emitter.rate > 0 and emitter.last_spawn >= emitter.rate:
+            due = int(emitter.last_spawn // emitter.rate)
+            emitter.last_spawn -= due * emitter.rate
+        if due and emitter.spawn_chance < 1.0:
+            due = int(buffer.rng.binomial(due, max(emitter.spawn_chance, 0.0)))
+        if emitter.particle_count:
+            due = max(0, min(due, emitter.particle_count - len(buffer)))
+        due += emitter.pending_burst
+        emitter.pending_burst = 0
+
+        if due > 0:
+            buffer.spawn((position.x, position.y), due, emitter.particle_lifetime)
+
+    def get_pool(self, particle_type) -> ParticlePool:
+        pool = self.pools.get(particle_type)
+        if pool is None:
+            pool = self.pools[particle_type] = ParticlePool(
+                self.pool_sizes.get(particle_type, self.pool_size))
+        return pool
+
+    def pool_stats(self) -> dict:
+        return {particle_type: pool.stats() for particle_type, pool in self.pools.items()}
+
+    def release_particle(self, ent, particle, emitter):
+        """Keep a dying particle's components in its pool for a later spawn."""
+        components = self.world.try_components(ent, *self.particle_components)
+        if not components:
+            return
+        # components held by a Storage backend are recycled by the backend
+        components = [
+            None if self.world.get_storage(component_type) else component
+            for component_type, component in zip(self.particle_components, components)]
+        self.get_pool(particle.type).release(
+            components, emitter.pool_size if emitter else None)
+
+    def spawn_particle(self, position, emitter):
         size = random.randint(8, 16)
-        return self.world.create_entity(
-            Position(position.x-int(size/2), position.y - int(size/2)),
-            Size(size, size),
-            Collider(),
-            Particle(emitter.particle_lifetime,
-                     particle_type=emitter.particle_type),
-            Renderable((size, size), color=(255, 255, 255)),
-            Physics(velocity=(random.randint(-100, 100),
-                    random.randint(-100, 100)))
-        ) if random.random() < emitter.spawn_chance else None
+        x, y = position.x-int(size/2), position.y - int(size/2)
+        velocity = (random.randint(-100, 100), random.randint(-100, 100))
+
+        pooled = self.get_pool(emitter.particle_type).acquire()
+        if pooled is None:
+            return (
+                Position(x, y),
+                Size(size, size),
+                Particle(emitter.particle_lifetime,
+                         particle_type=emitter.particle_type),
+                Renderable((size, size), color=(255, 255, 255)),
+                Physics(velocity=velocity)
+            )
+
+        position, size_c, particle, renderable, physics = pooled
+        if position is None:
+            position = Position(x, y)
+        else:
+            position.update(x, y)
+            position.delta.update(0, 0)
+            position.offset.update(0, 0)
+            position.attach = None
+        if size_c is None:
+            size_c = Size(size, size)
+        else:
+            size_c.update(size, size)
+            size_c.anchor = AlignmentType.top_left
+            size_c.scale = 1.0
+        particle.lifetime = emitter.particle_lifetime
+        particle.age = 0
+        particle.type = emitter.particle_type
+        # the surface is a flat fill that is scaled to Size when drawn
+        renderable.visible = True
+        renderable.layer = LayerType.none
+        if physics is None:
+            physics = Physics(velocity=velocity)
+        else:
+            physics.velocity.update(velocity)
+            physics.accelleration.update(0, 0)
+            physics.mass = 0.0
+            physics.density = 0.0
+        return (position, size_c, particle, renderable, physics)
 
 
 class EventProcessor(Processor):
     clicked = None
+    hovered = None
+    snapshot_path = 'world.snapshot'
 
-    def process(self, _):
-        for event in pygame.event.get():
-            if (
-                event.type != pygame.QUIT
-                and event.type == pygame.KEYDOWN
-                and event.key == pygame.K_ESCAPE
-                or event.type == pygame.QUIT
-            ):
-                self.world.game.on_cleanup()
+    def __init__(self, input_source: LiveInput = None, cell_size: int = 64):
+        super().__init__()
+        self.input = input_source or LiveInput()
+        self.dispatcher = EventDispatcher()
+        # Clickables on screen-space layers are hit in window coordinates,
+        # the rest in world coordinates
+        self.screen_index = SpatialHash(cell_size)
+        self.world_index = SpatialHash(cell_size)
+        self.hit_rects = {}
+        self.clickable_changes = None
+        self.moves = None
+
+        subscribe = self.dispatcher.subscribe
+        subscribe(pygame.QUIT, self.on_quit)
+        subscribe(pygame.KEYDOWN, self.on_key_down)
+        subscribe(file_type, self.handle_file_event)
+        subscribe(pygame.MOUSEBUTTONDOWN, self.on_mouse_down)
+        subscribe(pygame.MOUSEBUTTONUP, self.on_mouse_up)
+        subscribe(pygame.MOUSEMOTION, self.on_mouse_motion)
 
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                self.check_click_down(event.pos)
-            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-                self.check_click_up(event.pos)
+    def process(self, _):
+        self.update_hit_index()
+        state = self.input.poll()
+        dispatch = self.dispatcher.dispatch
+        for event in state.events:
+            dispatch(event)
 
-        pressed = pygame.key.get_pressed()
-        for ent, (physics, player_controlled) in self.world.get_components(Physics, PlayerControlled):
+        pressed = state.pressed
+        speed = PlayerControlled.speed
+        for ent, (physics,) in self.world.get_components(Physics, PlayerControlled):
             if pressed[pygame.K_w]:
-                physics.velocity.y -= player_controlled.speed
+                physics.velocity.y -= speed
             if pressed[pygame.K_s]:
-                physics.velocity.y += player_controlled.speed
+                physics.velocity.y += speed
             if pressed[pygame.K_a]:
-                physics.velocity.x -= player_controlled.speed
+                physics.velocity.x -= speed
             if pressed[pygame.K_d]:
-                physics.velocity.x += player_controlled.speed
+                physics.velocity.x += speed
+
+    def on_quit(self, event):
+        self.world.game.stop()
+
+    def on_key_down(self, event):
+        if event.key == pygame.K_ESCAPE:
+            self.world.game.stop()
+        elif event.key == pygame.K_F3:
+            renderer = self.world.get_processor(RenderProcessor)
+            renderer.show_profiler = not renderer.show_profiler
+
+    def on_mouse_down(self, event):
+        if event.button == 1:
+            self.check_click_down(event.pos)
+
+    def on_mouse_up(self, event):
+        if event.button == 1:
+            self.check_click_up(event.pos)
+
+    def on_mouse_motion(self, event):
+        self.check_hover(event.pos)
+
+    def handle_file_event(self, event):
+        path = getattr(event, 'path', self.snapshot_path)
+        if event.method == 'save':
+            save_world(self.world, path)
+        elif event.method in ('open', 'new'):
+            if event.method == 'open':
+                load_world(self.world, path)
+            else:
+                self.world.clear_database()
+            # particles are tracked by entity ID, which no longer mean the same thing
+            particle_processor = self.world.get_processor(ParticleProcessor)
+            if particle_processor:
+                particle_processor.particles.clear()
+            movement_processor = self.world.get_processor(MovementProcessor)
+            if movement_processor:
+                movement_processor.reset()
+            self.reset_hit_index()
+            self.clicked = None
+            self.hovered = None
+
+    def reset_hit_index(self):
+        """Forget every indexed Clickable and index them all again on the next pass."""
+        self.screen_index.clear()
+        self.world_index.clear()
+        self.hit_rects.clear()
+        if self.clickable_changes is not None:
+            self.moves.clear()
+            self.clickable_changes.clear()
+            self.clickable_changes.update(ent for ent, _ in self.world.get_component(Clickable))
+
+    def update_hit_index(self):
+        """Re-index the Clickables that were added, removed, moved or resized."""
+        if self.clickable_changes is None:
+            self.clickable_changes = self.world.track_changes(Clickable)
+            self.moves = self.world.track_changes(Position, Size, Renderable)
+            self.clickable_changes.update(ent for ent, _ in self.world.get_component(Clickable))
+        changed = self.moves.intersection(self.hit_rects)
+        changed.update(self.clickable_changes)
+        self.moves.clear()
+        self.clickable_changes.clear()
+
+        for ent in changed:
+            components = self.world.try_components(ent, Clickable, Position, Size)
+            if not components:
+                self.screen_index.remove(ent)
+                self.world_index.remove(ent)
+                self.hit_rects.pop(ent, None)
+                continue
+            _, position, size = components
+            renderable = self.world.try_component(ent, Renderable)
+            layer = renderable.layer if renderable else LayerType.none
+            x, y = position.x, position.y
+            index, other = self.world_index, self.screen_index
+            if layer in RenderProcessor.screen_layers:
+                index, other = other, index
+            other.remove(ent)
+            left, top = math.floor(x), math.floor(y)
+            index.update(ent, pygame.Rect(left, top,
+                                          math.ceil(x + size.width) - left + 1,
+                                          math.ceil(y + size.height) - top + 1))
+            self.hit_rects[ent] = x, y, size.width, size.height, layer
+
+    def hit_test(self, pos):
+        """Get the topmost Clickable under a window position, or None."""
+        hit_rects = self.hit_rects
+        hits = []
+        renderer = self.world.get_processor(RenderProcessor)
+        world_pos = renderer.to_world(pos) if renderer else pos
+        for index, (x, y) in ((self.screen_index, pos), (self.world_index, world_pos)):
+            for ent in index.query_point(x, y):
+                left, top, width, height, _ = hit_rects[ent]
+                if left <= x <= left + width and top <= y <= top + height:
+                    hits.append(ent)
+        if not hits:
+            return None
+        if len(hits) == 1:
+            return hits[0]
+        # the last drawn is on top: highest layer, then latest in the layer
+        slots = renderer.queue.slots if renderer else {}
+        return max(hits, key=lambda ent: (hit_rects[ent][4], slots.get(ent, (None, -1))[1]))
+
+    def check_hover(self, pos):
+        hovered = self.hit_test(pos)
+        if hovered != self.hovered:
+            for ent, state in ((self.hovered, False), (hovered, True)):
+                clickable = self.world.try_component(ent, Clickable) if ent is not None else None
+                if clickable:
+                    clickable.hovered = state
+            self.hovered = hovered
+        if self.clicked is not None:
+            # a dragged press only counts while the pointer is over its Clickable
+            clickable = self.world.try_component(self.clicked, Clickable)
+            if clickable:
+                clickable.pressed = hovered == self.clicked
 
     def check_click_down(self, pos):
-        x, y = pos
-        self.clicked = None
-        for ent, (clickable, position, size) in self.world.get_components(Clickable, Position, Size):
-            if x >= position.x and x <= position.x+size.width and y >= position.y and y <= position.y+size.height:
-                clickable.pressed = True
-                clickable.pressed_start_time = time()
-                self.clicked = ent
-        if not self.clicked:
+        self.clicked = self.hit_test(pos)
+        if self.clicked is not None:
+            clickable = self.world.component_for_entity(self.clicked, Clickable)
+            clickable.pressed = True
+            clickable.pressed_start_time = time()
+        else:
             # print('create emmitter', pos)
-            self.world.create_entity(
+            renderer = self.world.get_processor(RenderProcessor)
+            self.commands.create_entity(
                 ParticleEmitter(rate=.01, particle_lifetime=4.0,
                                 spawn_chance=random.random()),
                 Renderable(color=(255, 255, 255), size=(8, 8)),
-                Position(pos),
+                Position(renderer.to_world(pos) if renderer else pos),
                 Size(),
                 PlayerControlled()
             )
 
     def check_click_up(self, pos):
-        x, y = pos
-        if not self.clicked:
+        clicked, self.clicked = self.clicked, None
+        if clicked is None:
+            return
+        clickable = self.world.try_component(clicked, Clickable)
+        if not clickable:
             return
-        # position = self.world.try_component(self.clicked, Position)
-        # size = self.world.try_component(self.clicked, Size)
-        # if not (position and size):
-        #     return
-        # if (
-        #     x < position.x
-        #     or x > position.x + size.width
-        #     or y < position.y
-        #     or y > position.y + size.height
-        # ):
-        #     return
-        # clickable = self.world.try_component(self.clicked, Clickable)
-        # if not clickable:
-        #     return
-        # clickable.pressed_time = time() - clickable.pressed_start_time
-        # clickable.pressed = False
-        # print(clickable.pressed_time)
-        # clickable.action()
+        clickable.pressed = False
+        if clickable.pressed_start_time is not None:
+            clickable.pressed_time = time() - clickable.pressed_start_time
+        if self.hit_test(pos) == clicked:
+            clickable.action()
@@ -0,0 +1,271 @@
+from collections import OrderedDict
+from typing import Tuple
+
+import pygame
+
+
+class SurfaceCache:
+    """
+    A least-recently-used cache of scaled copies of surfaces.
+
+    Entries are keyed by the source surface and the target size, and are
+    evicted oldest first once their pixels exceed the memory budget.
+
+    Attributes:
+        budget : int
+            The most bytes of scaled pixels to keep.
+        scale_step : float
+            Scales are rounded to a multiple of this before sizing, so nearby
+            scales share an entry (0 disables quantization).
+        entries : OrderedDict
+            The scaled surfaces, least recently used first.
+        size : int
+            The bytes of pixels currently cached.
+        hits : int
+            Lookups served from the cache.
+        misses : int
+            Lookups that had to scale a surface.
+        evictions : int
+            Entries dropped to stay within the budget.
+    """
+
+    def __init__(self, budget: int = 16 * 1024 * 1024, scale_step: float = 0.0) -> None:
+        self.budget = budget
+        self.scale_step = scale_step
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_size(self, width: float, height: float, scale: float = 1.0) -> Tuple[int, int]:
+        """Get the pixel size of a surface drawn at a scale, after quantization."""
+        if self.scale_step:
+            scale = round(scale / self.scale_step) * self.scale_step
+        return max(int(width * scale), 0), max(int(height * scale), 0)
+
+    def scale(self, surface: pygame.Surface, width: float, height: float,
+              scale: float = 1.0) -> pygame.Surface:
+        """Get a surface scaled to (width * scale, height * scale)."""
+        size = self.get_size(width, height, scale)
+        if size == surface.get_size():
+            return surface
+        key = surface, size
+        entries = self.entries
+        scaled = entries.get(key)
+        if scaled is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return scaled
+
+        self.misses += 1
+        scaled = pygame.transform.scale(surface, size)
+        cost = size[0] * size[1] * scaled.get_bytesize()
+        if cost > self.budget:
+            return scaled
+        entries[key] = scaled
+        self.size += cost
+        while self.size > self.budget:
+            (_, old_size), old = entries.popitem(last=False)
+            self.size -= old_size[0] * old_size[1] * old.get_bytesize()
+            self.evictions += 1
+        return scaled
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'budget': self.budget,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+
+class GlyphAtlas:
+    """
+    A bitmap font strip with precomputed glyph offsets and tinted copies.
+
+    Glyphs are packed left to right in the order of `widths`, each followed by
+    a one pixel gap. Tinted atlases are built once per color, and rendered
+    strings are kept in a bounded least-recently-used cache keyed by
+    (string, color).
+
+    Attributes:
+        image : pygame.Surface
+            The font strip, with transparent pixels between glyphs.
+        height : int
+            The height of every glyph.
+        glyphs : dict
+            The (x, width) of each character in the strip.
+        space_width : int
+            The advance of a space, or of any character missing from the font.
+        tints : dict
+            The font strip recolored, per color.
+        strings : OrderedDict
+            The rendered strings, least recently used first.
+        max_strings : int
+            The most rendered strings to keep.
+    """
+
+    def __init__(self, image: pygame.Surface, widths: dict,
+                 space_width: int = 3, max_strings: int = 512) -> None:
+        self.image = image
+        self.height = image.get_height()
+        self.glyphs = {}
+        x = 0
+        for char, width in widths.items():
+            self.glyphs[char] = x, width
+            x += width + 1
+        self.space_width = space_width
+        self.tints = {}
+        self.strings = OrderedDict()
+        self.max_strings = max_strings
+
+    def measure(self, string: str) -> int:
+        """Get the width of a string, in pixels."""
+        glyphs = self.glyphs
+        width = 0
+        for char in string:
+            glyph = glyphs.get(char)
+            width += glyph[1] + 1 if glyph else self.space_width
+        return max(width, 1)
+
+    def get_tint(self, color: tuple) -> pygame.Surface:
+        """Get the font strip with every glyph pixel set to a color."""
+        color = tuple(color[:3])
+        tint = self.tints.get(color)
+        if tint is None:
+            tint = self.tints[color] = self.image.copy()
+            pixels = pygame.surfarray.pixels3d(tint)
+            pixels[:, :] = color
+            del pixels
+        return tint
+
+    def render(self, string: str, color: tuple) -> pygame.Surface:
+        """Get a string drawn in a color, rendering it only on a cache miss."""
+        key = string, tuple(color[:3])
+        strings = self.strings
+        surf = strings.get(key)
+        if surf is not None:
+            strings.move_to_end(key)
+            return surf
+
+        tint = self.get_tint(color)
+        glyphs = self.glyphs
+        height = self.height
+        surf = pygame.Surface((self.measure(string), height), pygame.SRCALPHA)
+        x = 0
+        for char in string:
+            glyph = glyphs.get(char)
+            if glyph is None:
+                x += self.space_width
+                continue
+            glyph_x, width = glyph
+            surf.blit(tint, (x, 0), (glyph_x, 0, width, height))
+            x += width + 1
+
+        strings[key] = surf
+        if len(strings) > self.max_strings:
+            strings.popitem(last=False)
+        return surf
+
+
+class RenderQueue:
+    """
+    Per-layer blit lists that persist between frames.
+
+    Each layer keeps a list of (surface, position) pairs ready to hand to
+    `Surface.blits`, so only sprites that change need any Python work.
+    Removal swaps the last sprite of a layer into the freed slot. Every
+    change records the screen rects it affects in `damage`.
+
+    Attributes:
+        layers : dict
+            The (surface, position) pairs of each layer.
+        owners : dict
+            The entity of each pair, parallel to `layers`.
+        slots : dict
+            The (layer, index) of each queued entity.
+        order : list
+            The layers in draw order.
+        damage : list
+            The rects touched by changes since it was last cleared.
+    """
+
+    def __init__(self) -> None:
+        self.layers = {}
+        self.owners = {}
+        self.slots = {}
+        self.order = []
+        self.damage = []
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, ent: int) -> bool:
+        return ent in self.slots
+
+    def put(self, ent: int, layer, surface: pygame.Surface, position: Tuple[int, int]) -> None:
+        """Queue an entity's sprite, or update it if it is already queued."""
+        slot = self.slots.get(ent)
+        if slot is not None:
+            old_layer, index = slot
+            old_surface, old_position = self.layers[old_layer][index]
+            if old_layer == layer:
+                if old_surface is surface and old_position == position:
+                    return
+                self.layers[layer][index] = surface, position
+                self.damage.append(pygame.Rect(old_position, old_surface.get_size()))
+                self.damage.append(pygame.Rect(position, surface.get_size()))
+                return
+            self.remove(ent)
+
+        blits = self.layers.get(layer)
+        if blits is None:
+            blits = self.layers[layer] = []
+            self.owners[layer] = []
+            self.order = sorted(self.layers)
+        self.slots[ent] = layer, len(blits)
+        blits.append((surface, position))
+        self.owners[layer].append(ent)
+        self.damage.append(pygame.Rect(position, surface.get_size()))
+
+    def remove(self, ent: int) -> None:
+        """Remove an entity's sprite, if queued."""
+        slot = self.slots.pop(ent, None)
+        if slot is None:
+            return
+        layer, index = slot
+        blits = self.layers[layer]
+        owners = self.owners[layer]
+        surface, position = blits[index]
+        self.damage.append(pygame.Rect(position, surface.get_size()))
+        last = blits.pop()
+        last_owner = owners.pop()
+        if index < len(blits):
+            # the moved sprite now draws earlier, so it may change overlaps
+            blits[index] = last
+            owners[index] = last_owner
+            self.slots[last_owner] = layer, index
+            self.damage.append(pygame.Rect(last[1], last[0].get_size()))
+
+    def clear(self) -> None:
+        self.layers.clear()
+        self.owners.clear()
+        self.slots.clear()
+        self.order = []
+        self.damage.clear()
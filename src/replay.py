@@ -0,0 +1,103 @@
+"""
+Headless replay of a recorded session, timed frame by frame.
+
+Record a session with `--record`, then replay it with the same seed and App
+options on SDL's dummy video driver, e.g.
+
+    python -m src --record session.replay
+    python -m src.replay session.replay --output frames.jsonl
+
+The summary is printed as JSON; --output also writes every frame's total
+and per-processor milliseconds as JSON lines. See `src.inputs` for what is
+recorded.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+import pygame
+
+from . import App
+from .inputs import InputReplay
+from .processors import RenderProcessor
+
+
+def run(path: str, profile_path: str = None) -> dict:
+    """
+    Replay a recorded session headless, timing every frame.
+
+    :param path: The input log to replay.
+    :param profile_path: A JSON lines file to write each frame's timings to.
+    :return: A summary of the frame times, in milliseconds.
+    """
+
+    source = InputReplay(path)
+    app = App(**dict(source.options, profile=True, seed=source.seed, input_source=source))
+    app.on_init()
+    world = app.world
+    world.get_processor(RenderProcessor).show_profiler = source.options.get('profile', False)
+    # keep every sample of the session, so each frame's can be read back
+    profiler = world.profiler
+    profiler.window = len(source) * (app.max_steps + 1) + 1
+    profiler.times.clear()
+    profiler.entities.clear()
+
+    frame_times = []
+    output = open(profile_path, 'w') if profile_path else None
+    try:
+        for frame, dt in enumerate(source.replay()):
+            seen = {name: len(times) for name, times in profiler.times.items()}
+            app.update(dt)
+            processors = {}
+            for name, times in profiler.times.items():
+                samples = list(islice(times, seen.get(name, 0), None))
+                if samples:
+                    processors[name] = sum(samples) / 1e6
+            frame_ms = processors.pop('frame', None)
+            if frame_ms is not None:
+                frame_times.append((frame_ms, frame))
+            if output:
+                output.write(json.dumps({'frame': frame, 'dt': dt, 'frame_ms': frame_ms,
+                                         'processors': processors}) + '\n')
+            if not app.running:
+                break
+    finally:
+        if output:
+            output.close()
+        world.set_scheduler(None)
+        pygame.quit()
+
+    ordered = sorted(frame_times, reverse=True)
+    return {
+        'replay': path,
+        'seed': source.seed,
+        'options': source.options,
+        'frames': len(source),
+        'rendered': len(ordered),
+        'total_ms': sum(frame_ms for frame_ms, _ in ordered),
+        'p50_ms': ordered[len(ordered) // 2][0] if ordered else None,
+        'max_ms': ordered[0][0] if ordered else None,
+        'slowest': [frame for _, frame in ordered[:5]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded session headless.')
+    parser.add_argument('path')
+    parser.add_argument('--output', help='write per-frame timings here, as JSON lines')
+    parser.add_argument('--display', action='store_true',
+                        help="use the real video driver instead of SDL's dummy one")
+    args = parser.parse_args(argv)
+    if not args.display:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    start = time.perf_counter()
+    summary = run(args.path, args.output)
+    summary['wall_s'] = time.perf_counter() - start
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
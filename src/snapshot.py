@@ -0,0 +1,465 @@
+"""
+Binary World snapshots.
+
+A snapshot holds the entity ID state of a World and one batch per
+archetype: its entity IDs plus one encoded section per component type.
+Numeric components are stored as packed NumPy structured arrays, others as
+JSON records indexed by row, so identical records are stored once. Tags
+have empty sections. The layout is
+
+    magic (4 bytes) | version (u32) | metadata length (u64) | metadata (JSON)
+    | padding to 8 bytes | data sections, each 8 byte aligned
+
+where the metadata records the dtype, offset and length of every section.
+Snapshots are read through a memory map, so opening one only parses the
+metadata; sections are viewed in place and components are only built when
+a snapshot is restored into a World.
+
+Component types are looked up by name in `ENCODERS`. Types without an
+encoder (such as `Clickable`, which holds a callable) are skipped on save,
+and entities left with no saved components are saved as deleted.
+"""
+import json
+import mmap
+import struct
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+from .components import Camera
+from .components import Collider
+from .components import Collision
+from .components import FollowMouse
+from .components import Particle
+from .components import ParticleEmitter
+from .components import Physics
+from .components import PlayerControlled
+from .components import Position
+from .components import Renderable
+from .components import Size
+from .components import Text
+from .modules.esper import retire_entity
+from .types import AlignmentType
+from .types import LayerType
+from .types import ParticleType
+
+
+MAGIC = b'ECSW'
+VERSION = 1
+HEADER = struct.Struct('<4sIQ')
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _enum(value) -> int:
+    return -1 if value is None else value.value
+
+
+def _from_enum(enum_type, value: int):
+    return None if value < 0 else enum_type(value)
+
+
+class ArrayEncoder:
+    """
+    Encodes a component type as rows of a NumPy structured array.
+
+    Attributes:
+        dtype : numpy.dtype
+            The layout of one row.
+        to_row : callable
+            Gets the row tuple of a component.
+        from_row : callable
+            Builds a component from a row tuple.
+    """
+
+    kind = 'array'
+
+    def __init__(self, fields: list, to_row: Callable, from_row: Callable) -> None:
+        self.dtype = np.dtype(fields)
+        self.to_row = to_row
+        self.from_row = from_row
+
+    def encode(self, components: list) -> bytes:
+        to_row = self.to_row
+        return np.array([to_row(component) for component in components], dtype=self.dtype).tobytes()
+
+    def view(self, buffer, offset: int, count: int) -> np.ndarray:
+        return np.frombuffer(buffer, dtype=self.dtype, count=count, offset=offset)
+
+    def decode(self, buffer, offset: int, length: int, count: int) -> list:
+        from_row = self.from_row
+        return [from_row(row) for row in self.view(buffer, offset, count).tolist()]
+
+
+class JSONEncoder:
+    """
+    Encodes a component type as JSON records, plus a u32 array giving the
+    record of each row.
+
+    Attributes:
+        to_record : callable
+            Gets the JSON-compatible record of a component.
+        from_record : callable
+            Builds a component from a record.
+        key : callable
+            Gets a hashable key of a component, so components with equal
+            keys share one record (optional).
+    """
+
+    kind = 'json'
+
+    def __init__(self, to_record: Callable, from_record: Callable, key: Callable = None) -> None:
+        self.to_record = to_record
+        self.from_record = from_record
+        self.key = key
+
+    def encode(self, components: list) -> bytes:
+        to_record = self.to_record
+        if self.key is None:
+            records = [to_record(component) for component in components]
+            index = np.arange(len(records), dtype='<u4')
+        else:
+            key = self.key
+            records = []
+            seen = {}
+            index = np.empty(len(components), dtype='<u4')
+            for row, component in enumerate(components):
+                component_key = key(component)
+                record = seen.get(component_key)
+                if record is None:
+                    record = seen[component_key] = len(records)
+                    records.append(to_record(component))
+                index[row] = record
+        head = index.tobytes()
+        return head + b'\0' * (_align(len(head)) - len(head)) + json.dumps(records).encode()
+
+    def decode(self, buffer, offset: int, length: int, count: int) -> list:
+        from_record = self.from_record
+        index = np.frombuffer(buffer, dtype='<u4', count=count, offset=offset).tolist()
+        start = offset + _align(count * 4)
+        records = json.loads(bytes(buffer[start:offset + length]))
+        return [from_record(records[record]) for record in index]
+
+
+class TagEncoder:
+    """
+    Encodes a tag component type. Tags hold no data, so the section is
+    empty; which entities carry the tag is recorded by their archetype.
+
+    Attributes:
+        component_type : type
+            The tag type, whose shared instance is restored.
+    """
+
+    kind = 'tag'
+    dtype = np.dtype([])
+
+    def __init__(self, component_type: type) -> None:
+        self.component_type = component_type
+
+    def encode(self, components: list) -> bytes:
+        return b''
+
+    def view(self, buffer, offset: int, count: int) -> np.ndarray:
+        return np.empty(count, dtype=self.dtype)
+
+    def decode(self, buffer, offset: int, length: int, count: int) -> list:
+        return [self.component_type()] * count
+
+
+def _position(row):
+    x, y, delta_x, delta_y, offset_x, offset_y, attach = row
+    position = Position(x, y, (offset_x, offset_y), attach or None)
+    position.delta.update(delta_x, delta_y)
+    return position
+
+
+def _size(row):
+    width, height, scale, anchor = row
+    return Size(width, height, AlignmentType(anchor), scale)
+
+
+def _physics(row):
+    velocity_x, velocity_y, accelleration_x, accelleration_y, mass, density = row
+    return Physics((velocity_x, velocity_y), (accelleration_x, accelleration_y), mass, density)
+
+
+def _particle(row):
+    lifetime, age, particle_type = row
+    particle = Particle(lifetime, _from_enum(ParticleType, particle_type))
+    particle.age = age
+    return particle
+
+
+def _camera(row):
+    x, y, zoom, offset_x, offset_y, target = row
+    camera = Camera((x, y), zoom, target or None)
+    camera.offset.update(offset_x, offset_y)
+    return camera
+
+
+def _renderable_record(renderable):
+    record = {
+        'file_path': renderable.file_path,
+        'size': list(renderable.size) if renderable.size else None,
+        'visible': renderable.visible,
+        'is_animated': renderable.is_animated,
+        'layer': renderable.layer.value,
+    }
+    if not renderable.file_path:
+        record['color'] = list(renderable.surface.get_at((0, 0)))[:3]
+    return record
+
+
+def _renderable(record):
+    return Renderable(size=record['size'], file_path=record['file_path'],
+                      visible=record['visible'], is_animated=record['is_animated'],
+                      color=record.get('color'), layer=LayerType(record['layer']))
+
+
+def _text_record(text):
+    return {
+        'string': text.string, 'size': text.size, 'color': list(text.color),
+        'align': text.align.value, 'offset_x': text.offset_x, 'offset_y': text.offset_y,
+        'attach': text.attach, 'visible': text.visible,
+    }
+
+
+def _text(record):
+    return Text(record['string'], record['size'], tuple(record['color']),
+                AlignmentType(record['align']), record['offset_x'], record['offset_y'],
+                record['attach'], record['visible'])
+
+
+def _emitter_record(emitter):
+    return {
+        'rate': emitter.rate, 'last_spawn': emitter.last_spawn,
+        'particle_lifetime': emitter.particle_lifetime,
+        'particle_count': emitter.particle_count,
+        'particle_type': _enum(emitter.particle_type),
+        'spawn_chance': emitter.spawn_chance, 'pool_size': emitter.pool_size,
+        'batched': emitter.batched, 'capacity': emitter.capacity,
+    }
+
+
+def _emitter(record):
+    emitter = ParticleEmitter(record['rate'], record['particle_lifetime'],
+                              record['particle_count'],
+                              _from_enum(ParticleType, record['particle_type']),
+                              record['spawn_chance'], record['pool_size'],
+                              record['batched'], record['capacity'])
+    emitter.last_spawn = record['last_spawn']
+    return emitter
+
+
+ENCODERS: Dict[type, object] = {
+    Position: ArrayEncoder(
+        [('x', 'f8'), ('y', 'f8'), ('delta_x', 'f8'), ('delta_y', 'f8'),
+         ('offset_x', 'f8'), ('offset_y', 'f8'), ('attach', 'i8')],
+        lambda p: (p.x, p.y, p.delta.x, p.delta.y, p.offset.x, p.offset.y, p.attach or 0),
+        _position),
+    Size: ArrayEncoder(
+        [('width', 'f8'), ('height', 'f8'), ('scale', 'f8'), ('anchor', 'i1')],
+        lambda s: (s.width, s.height, s.scale, s.anchor.value),
+        _size),
+    Physics: ArrayEncoder(
+        [('velocity_x', 'f8'), ('velocity_y', 'f8'), ('accelleration_x', 'f8'),
+         ('accelleration_y', 'f8'), ('mass', 'f8'), ('density', 'f8')],
+        lambda p: (p.velocity.x, p.velocity.y, p.accelleration.x, p.accelleration.y,
+                   p.mass, p.density),
+        _physics),
+    Particle: ArrayEncoder(
+        [('lifetime', 'f8'), ('age', 'f8'), ('type', 'i1')],
+        lambda p: (p.lifetime, p.age, _enum(p.type)),
+        _particle),
+    Collider: TagEncoder(Collider),
+    Collision: ArrayEncoder(
+        [('ent', 'i8')],
+        lambda c: (c.ent,),
+        lambda row: Collision(row[0])),
+    PlayerControlled: TagEncoder(PlayerControlled),
+    FollowMouse: TagEncoder(FollowMouse),
+    Camera: ArrayEncoder(
+        [('x', 'f8'), ('y', 'f8'), ('zoom', 'f8'), ('offset_x', 'f8'),
+         ('offset_y', 'f8'), ('target', 'i8')],
+        lambda c: (c.position.x, c.position.y, c.zoom, c.offset.x, c.offset.y, c.target or 0),
+        _camera),
+    Renderable: JSONEncoder(
+        _renderable_record, _renderable,
+        lambda r: (id(r.surface), r.file_path, r.visible, r.is_animated, r.layer)),
+    Text: JSONEncoder(_text_record, _text),
+    ParticleEmitter: JSONEncoder(_emitter_record, _emitter),
+}
+
+
+def register_encoder(component_type: type, encoder) -> None:
+    """Make a component type savable, with an ArrayEncoder, JSONEncoder or TagEncoder."""
+    ENCODERS[component_type] = encoder
+
+
+def save_world(world, path: str) -> dict:
+    """
+    Write a snapshot of every living entity in a World.
+
+    :return: The number of entities and bytes written, and the names of the
+             component types that were skipped for lack of an encoder.
+    """
+    generations, free_indices, batches = world.dump_entities()
+    chunks = []
+    offset = 0
+
+    def add(data: bytes) -> dict:
+        nonlocal offset
+        section = {'offset': offset, 'length': len(data)}
+        chunks.append(data)
+        padding = _align(len(data)) - len(data)
+        if padding:
+            chunks.append(b'\0' * padding)
+        offset += len(data) + padding
+        return section
+
+    skipped = set()
+    archetypes = []
+    entity_count = 0
+    for entities, columns in batches:
+        sections = {}
+        for component_type, components in columns.items():
+            encoder = ENCODERS.get(component_type)
+            if encoder is None:
+                skipped.add(component_type.__name__)
+                continue
+            section = add(encoder.encode(components))
+            section['kind'] = encoder.kind
+            sections[component_type.__name__] = section
+        if columns and not sections:
+            # nothing of these entities is saved, so their IDs are retired
+            for entity in entities:
+                retire_entity(generations, free_indices, entity)
+            continue
+        archetypes.append({
+            'count': len(entities),
+            'entities': add(np.asarray(entities, dtype='<i8').tobytes()),
+            'columns': sections,
+        })
+        entity_count += len(entities)
+
+    metadata = json.dumps({
+        'generations': add(np.asarray(generations, dtype='<u2').tobytes()),
+        'generation_count': len(generations),
+        'free_indices': add(np.asarray(free_indices, dtype='<i4').tobytes()),
+        'free_count': len(free_indices),
+        'archetypes': archetypes,
+    }).encode()
+    header = HEADER.pack(MAGIC, VERSION, len(metadata))
+    preamble = header + metadata
+    preamble += b'\0' * (_align(len(preamble)) - len(preamble))
+
+    with open(path, 'wb') as file:
+        file.write(preamble)
+        file.writelines(chunks)
+    return {'entities': entity_count, 'bytes': len(preamble) + offset,
+            'skipped': sorted(skipped)}
+
+
+class Snapshot:
+    """
+    A memory-mapped snapshot file.
+
+    Attributes:
+        path : str
+            The snapshot file.
+        metadata : dict
+            The layout of every section.
+        entity_count : int
+            The number of entities saved.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a world snapshot')
+        if version != VERSION:
+            self.close()
+            raise ValueError(f'unsupported snapshot version {version}')
+        self.metadata = json.loads(self._map[HEADER.size:HEADER.size + length])
+        self._start = _align(HEADER.size + length)
+        self._types = {component_type.__name__: component_type for component_type in ENCODERS}
+        self.entity_count = sum(archetype['count'] for archetype in self.metadata['archetypes'])
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def _array(self, section: dict, dtype: str, count: int) -> np.ndarray:
+        return np.frombuffer(self._map, dtype=dtype, count=count,
+                             offset=self._start + section['offset'])
+
+    def entities(self) -> np.ndarray:
+        """Get the saved entity IDs, in archetype order."""
+        arrays = [self._array(archetype['entities'], '<i8', archetype['count'])
+                  for archetype in self.metadata['archetypes']]
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype='<i8')
+
+    def column(self, component_type: type) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get the saved rows of a numeric component type, and their entities.
+
+        Returns one (entities, rows) pair per archetype holding the type,
+        both arrays viewed straight from the memory map, so nothing is
+        copied or built. They are only valid while the snapshot is open.
+        """
+        encoder = ENCODERS[component_type]
+        name = component_type.__name__
+        blocks = []
+        for archetype in self.metadata['archetypes']:
+            section = archetype['columns'].get(name)
+            if section is None:
+                continue
+            count = archetype['count']
+            blocks.append((self._array(archetype['entities'], '<i8', count),
+                           encoder.view(self._map, self._start + section['offset'], count)))
+        return blocks
+
+    def restore(self, world) -> None:
+        """Replace every entity in a World with the saved ones, keeping their IDs."""
+        metadata = self.metadata
+        generations = self._array(metadata['generations'], '<u2',
+                                  metadata['generation_count']).tolist()
+        free_indices = self._array(metadata['free_indices'], '<i4',
+                                   metadata['free_count']).tolist()
+        world.load_entities(generations, free_indices, self._batches())
+
+    def _batches(self):
+        for archetype in self.metadata['archetypes']:
+            count = archetype['count']
+            entities = self._array(archetype['entities'], '<i8', count).tolist()
+            columns = {}
+            for name, section in archetype['columns'].items():
+                component_type = self._types.get(name)
+                if component_type is None:
+                    raise KeyError(f'no encoder registered for {name}')
+                columns[component_type] = ENCODERS[component_type].decode(
+                    self._map, self._start + section['offset'], section['length'], count)
+            yield entities, columns
+
+
+def load_world(world, path: str) -> int:
+    """Replace every entity in a World with a snapshot's. Returns how many were loaded."""
+    with Snapshot(path) as snapshot:
+        snapshot.restore(world)
+        return snapshot.entity_count
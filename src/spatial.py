@@ -0,0 +1,99 @@
+from typing import Iterable
+from typing import Set
+from typing import Tuple
+
+import pygame
+
+
+_EMPTY = frozenset()
+
+
+class SpatialHash:
+    """
+    A uniform grid that maps cells to the entities whose rects overlap them.
+
+    Entities are re-bucketed only when the span of cells they cover changes,
+    so moving within a cell costs a single tuple comparison.
+
+    Attributes:
+        cell_size : int
+            The width and height of a cell, in pixels.
+        cells : dict
+            The entities overlapping each (column, row) cell.
+        spans : dict
+            The (left, top, right, bottom) cell span of each entity.
+    """
+
+    def __init__(self, cell_size: int = 64) -> None:
+        self.cell_size = cell_size
+        self.cells = {}
+        self.spans = {}
+
+    def __contains__(self, ent: int) -> bool:
+        return ent in self.spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def get_span(self, rect: pygame.Rect) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                max(rect.right - 1, rect.left) // size,
+                max(rect.bottom - 1, rect.top) // size)
+
+    def update(self, ent: int, rect: pygame.Rect) -> None:
+        """Insert an entity, or move it if its cell span has changed."""
+        span = self.get_span(rect)
+        old_span = self.spans.get(ent)
+        if span == old_span:
+            return
+        if old_span is not None:
+            self._discard(ent, old_span)
+        self.spans[ent] = span
+        cells = self.cells
+        for key in self._cells_in(span):
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = {ent}
+            else:
+                bucket.add(ent)
+
+    def remove(self, ent: int) -> None:
+        """Remove an entity, if present."""
+        span = self.spans.pop(ent, None)
+        if span is not None:
+            self._discard(ent, span)
+
+    def query(self, rect: pygame.Rect) -> Set[int]:
+        """Get every entity sharing at least one cell with a rect."""
+        found = set()
+        cells = self.cells
+        for key in self._cells_in(self.get_span(rect)):
+            bucket = cells.get(key)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def query_point(self, x: float, y: float) -> Set[int]:
+        """Get every entity overlapping the cell that contains a point. Do not modify the set."""
+        size = self.cell_size
+        return self.cells.get((int(x // size), int(y // size)), _EMPTY)
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.spans.clear()
+
+    def _discard(self, ent: int, span: Tuple[int, int, int, int]) -> None:
+        cells = self.cells
+        for key in self._cells_in(span):
+            bucket = cells[key]
+            bucket.discard(ent)
+            if not bucket:
+                del cells[key]
+
+    @staticmethod
+    def _cells_in(span: Tuple[int, int, int, int]) -> Iterable[Tuple[int, int]]:
+        left, top, right, bottom = span
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                yield column, row
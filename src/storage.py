@@ -0,0 +1,410 @@
+import numpy as np
+from pygame import Vector2
+
+from .components import Physics
+from .components import Position
+from .components import Size
+from .modules.esper import Storage
+
+
+class _Vector2Row:
+    """
+    Vector2-like access to one row of an (N, 2) float column.
+
+    Subclasses provide `_slot` and an `_array` method returning the column.
+    Arithmetic returns plain pygame Vector2s, while in-place operators write
+    straight back into the column.
+    """
+
+    __slots__ = ()
+
+    @property
+    def x(self) -> float:
+        return float(self._array()[self._slot, 0])
+
+    @x.setter
+    def x(self, value: float) -> None:
+        self._array()[self._slot, 0] = value
+
+    @property
+    def y(self) -> float:
+        return float(self._array()[self._slot, 1])
+
+    @y.setter
+    def y(self, value: float) -> None:
+        self._array()[self._slot, 1] = value
+
+    def __len__(self) -> int:
+        return 2
+
+    def __getitem__(self, index: int) -> float:
+        return float(self._array()[self._slot, index])
+
+    def __setitem__(self, index: int, value: float) -> None:
+        self._array()[self._slot, index] = value
+
+    def __iter__(self):
+        row = self._array()[self._slot]
+        return iter((float(row[0]), float(row[1])))
+
+    def __eq__(self, other) -> bool:
+        try:
+            return len(other) == 2 and self.x == other[0] and self.y == other[1]
+        except TypeError:
+            return NotImplemented
+
+    def __add__(self, other) -> Vector2:
+        return Vector2(self.x, self.y) + other
+
+    def __radd__(self, other) -> Vector2:
+        return other + Vector2(self.x, self.y)
+
+    def __sub__(self, other) -> Vector2:
+        return Vector2(self.x, self.y) - other
+
+    def __rsub__(self, other) -> Vector2:
+        return other - Vector2(self.x, self.y)
+
+    def __mul__(self, other) -> Vector2:
+        return Vector2(self.x, self.y) * other
+
+    def __rmul__(self, other) -> Vector2:
+        return other * Vector2(self.x, self.y)
+
+    def __truediv__(self, other) -> Vector2:
+        return Vector2(self.x, self.y) / other
+
+    def __neg__(self) -> Vector2:
+        return -Vector2(self.x, self.y)
+
+    def __iadd__(self, other):
+        row = self._array()[self._slot]
+        row[0] += other[0]
+        row[1] += other[1]
+        return self
+
+    def __isub__(self, other):
+        row = self._array()[self._slot]
+        row[0] -= other[0]
+        row[1] -= other[1]
+        return self
+
+    def __imul__(self, other: float):
+        self._array()[self._slot] *= other
+        return self
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.x}, {self.y})'
+
+
+class _ColumnRow(_Vector2Row):
+    """A Vector2-like attribute of a view, such as `Position.delta`."""
+
+    __slots__ = ('_owner', '_name')
+
+    def __init__(self, owner, name: str) -> None:
+        self._owner = owner
+        self._name = name
+
+    @property
+    def _slot(self) -> int:
+        return self._owner._slot
+
+    def _array(self) -> np.ndarray:
+        return getattr(self._owner._store, self._name)
+
+
+class PositionView(_Vector2Row):
+    """
+    A Position component stored in a ColumnStore.
+
+    Attributes:
+        x : float
+            The x coordinate of the component.
+        y : float
+            The y coordinate of the component.
+        delta : Vector2-like
+            The movement to apply on the next MovementProcessor pass.
+        offset : Vector2-like
+            The offset from the attached entity, or the draw offset.
+        attach : int
+            The entity this position follows, if any.
+    """
+
+    __slots__ = ('_store', '_slot', '_delta', '_offset')
+
+    def __init__(self, store: 'ColumnStore', slot: int, position: Position) -> None:
+        self._store = store
+        self._slot = slot
+        self._delta = _ColumnRow(self, 'delta')
+        self._offset = _ColumnRow(self, 'offset')
+        store.position[slot] = (position.x, position.y)
+        store.delta[slot] = (position.delta.x, position.delta.y)
+        store.offset[slot] = (position.offset.x, position.offset.y)
+        store.attach[slot] = position.attach or 0
+
+    def _array(self) -> np.ndarray:
+        return self._store.position
+
+    @property
+    def attach(self) -> int:
+        return int(self._store.attach[self._slot]) or None
+
+    @attach.setter
+    def attach(self, value: int) -> None:
+        self._store.attach[self._slot] = value or 0
+
+    @property
+    def delta(self) -> _ColumnRow:
+        return self._delta
+
+    @delta.setter
+    def delta(self, value) -> None:
+        self._store.delta[self._slot] = (value[0], value[1])
+
+    @property
+    def offset(self) -> _ColumnRow:
+        return self._offset
+
+    @offset.setter
+    def offset(self, value) -> None:
+        self._store.offset[self._slot] = (value[0], value[1])
+
+
+class SizeView(_Vector2Row):
+    """
+    A Size component stored in a ColumnStore.
+
+    Attributes:
+        width : float
+            The width of the component.
+        height : float
+            The height of the component.
+        scale : float
+            The render scale of the component.
+        anchor : AlignmentType
+            The alignment of the component.
+    """
+
+    __slots__ = ('_store', '_slot', 'anchor')
+
+    def __init__(self, store: 'ColumnStore', slot: int, size: Size) -> None:
+        self._store = store
+        self._slot = slot
+        store.size[slot] = (size.x, size.y)
+        store.scale[slot] = size.scale
+        self.anchor = size.anchor
+
+    def _array(self) -> np.ndarray:
+        return self._store.size
+
+    @property
+    def width(self) -> float:
+        return self.x
+
+    @width.setter
+    def width(self, value: float) -> None:
+        self.x = value
+
+    @property
+    def height(self) -> float:
+        return self.y
+
+    @height.setter
+    def height(self, value: float) -> None:
+        self.y = value
+
+    @property
+    def scale(self) -> float:
+        return float(self._store.scale[self._slot])
+
+    @scale.setter
+    def scale(self, value: float) -> None:
+        self._store.scale[self._slot] = value
+
+
+class PhysicsView:
+    """
+    A Physics component stored in a ColumnStore.
+
+    Attributes:
+        velocity : Vector2-like
+            The velocity of the component.
+        accelleration : Vector2-like
+            The acceleration of the component.
+        mass : float
+            The mass of the component.
+        density : float
+            The density of the component.
+    """
+
+    __slots__ = ('_store', '_slot', '_velocity', '_accelleration')
+
+    def __init__(self, store: 'ColumnStore', slot: int, physics: Physics) -> None:
+        self._store = store
+        self._slot = slot
+        self._velocity = _ColumnRow(self, 'velocity')
+        self._accelleration = _ColumnRow(self, 'accelleration')
+        store.velocity[slot] = (physics.velocity.x, physics.velocity.y)
+        store.accelleration[slot] = (physics.accelleration.x,
+                                     physics.accelleration.y)
+        store.mass[slot] = physics.mass
+        store.density[slot] = physics.density
+
+    @property
+    def velocity(self) -> _ColumnRow:
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value) -> None:
+        self._store.velocity[self._slot] = (value[0], value[1])
+
+    @property
+    def accelleration(self) -> _ColumnRow:
+        return self._accelleration
+
+    @accelleration.setter
+    def accelleration(self, value) -> None:
+        self._store.accelleration[self._slot] = (value[0], value[1])
+
+    @property
+    def mass(self) -> float:
+        return float(self._store.mass[self._slot])
+
+    @mass.setter
+    def mass(self, value: float) -> None:
+        self._store.mass[self._slot] = value
+
+    @property
+    def density(self) -> float:
+        return float(self._store.density[self._slot])
+
+    @density.setter
+    def density(self, value: float) -> None:
+        self._store.density[self._slot] = value
+
+
+class ColumnStore(Storage):
+    """
+    Structure-of-arrays storage for Position, Size and Physics components.
+
+    Every entity holding at least one of these components owns a dense slot,
+    and each numeric attribute lives in a contiguous NumPy column indexed by
+    that slot. The World keeps thin view objects in place of the original
+    components, so code such as `position.x` or `size.width` keeps working
+    while batched processors can operate on whole columns at once.
+
+    Views must not be used after their component has been removed, since the
+    slot may have been handed to another entity.
+
+    Attributes:
+        capacity : int
+            The number of slots allocated in every column.
+        length : int
+            One past the highest slot ever used.
+        slots : dict
+            The slot of each entity.
+        entities : numpy.ndarray
+            The entity owning each slot.
+        attach : numpy.ndarray
+            The entity each Position is attached to, or 0.
+        present : dict
+            A boolean column per component type, True where the slot holds
+            that component.
+    """
+
+    columns = {
+        'position': 2,
+        'delta': 2,
+        'offset': 2,
+        'size': 2,
+        'scale': 1,
+        'velocity': 2,
+        'accelleration': 2,
+        'mass': 1,
+        'density': 1,
+    }
+
+    views = {
+        Position: PositionView,
+        Size: SizeView,
+        Physics: PhysicsView,
+    }
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self.length = 0
+        self.slots = {}
+        self.free_slots = []
+        self.entities = np.zeros(capacity, dtype=np.int64)
+        self.attach = np.zeros(capacity, dtype=np.int64)
+        self.present = {component_type: np.zeros(capacity, dtype=bool)
+                        for component_type in self.views}
+        for name, width in self.columns.items():
+            setattr(self, name, np.zeros((capacity, width) if width > 1 else capacity))
+
+    def register(self, world) -> None:
+        """Register this store for every component type it can hold."""
+        for component_type in self.views:
+            world.set_storage(component_type, self)
+
+    def adopt(self, entity: int, component_type: type, component: object) -> object:
+        slot = self.slots.get(entity)
+        if slot is None:
+            slot = self._allocate(entity)
+        self.present[component_type][slot] = True
+        return self.views[component_type](self, slot, component)
+
+    def release(self, entity: int, component_type: type, component: object) -> None:
+        slot = self.slots[entity]
+        self.present[component_type][slot] = False
+        if not any(present[slot] for present in self.present.values()):
+            del self.slots[entity]
+            self.free_slots.append(slot)
+
+    def clear(self) -> None:
+        self.length = 0
+        self.slots.clear()
+        self.free_slots.clear()
+        for present in self.present.values():
+            present[:] = False
+
+    def mask(self, *component_types: type) -> np.ndarray:
+        """
+        Get a boolean mask of the slots holding all of the given component types.
+
+        The mask covers slots [0, length), so it can index any column sliced
+        to `length`.
+        """
+        mask = self.present[component_types[0]][:self.length].copy()
+        for component_type in component_types[1:]:
+            mask &= self.present[component_type][:self.length]
+        return mask
+
+    def _allocate(self, entity: int) -> int:
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            if self.length == self.capacity:
+                self._grow()
+            slot = self.length
+            self.length += 1
+        self.slots[entity] = slot
+        self.entities[slot] = entity
+        return slot
+
+    def _grow(self) -> None:
+        capacity = self.capacity * 2
+
+        def grown(old: np.ndarray) -> np.ndarray:
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.capacity] = old
+            return new
+
+        self.entities = grown(self.entities)
+        self.attach = grown(self.attach)
+        for component_type, present in self.present.items():
+            self.present[component_type] = grown(present)
+        for name in self.columns:
+            setattr(self, name, grown(getattr(self, name)))
+        self.capacity = capacity